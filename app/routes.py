@@ -30,7 +30,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scr
 
 # Import update_flag_safely
 try:
-    from update_flag import update_flag_safely
+    from update_flag import update_flag_safely, update_grid_safely
 except Exception as e:
     print(f"Error importing update_flag: {e}")
 
@@ -84,11 +84,18 @@ def _require_token():
     return True
 
 # --- Shared flag change logic ---
-def _change_flag_internal(country):
+def _parse_force(value):
+    """Interpret a force flag from JSON, form or query data ("false" stays False)."""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+def _change_flag_internal(country, force=False):
     if not country:
         return jsonify({'status': 'error', 'message': 'Country not provided'}), 400
     try:
-        success = update_flag_safely(country, force_cleanup=True)
+        # force refreshes the panel even if it already shows this flag
+        success = update_flag_safely(country, force_cleanup=True, force_refresh=force)
         if success == 0:
             return jsonify({'status': 'success', 'message': f'Flag changed to {country}'}), 200
         else:
@@ -100,6 +107,27 @@ def _change_flag_internal(country):
         logging.error(f"Error changing flag: {str(e)}", exc_info=True)
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+def _show_grid_internal(source, shape=None, force=False):
+    if source not in ('region', 'recent'):
+        return jsonify({'status': 'error', 'message': "Grid source must be 'region' or 'recent'"}), 400
+    try:
+        # The current flag is left unchanged, only the panel shows the grid
+        success = update_grid_safely(source, shape or None, force_refresh=force)
+        if success == 0:
+            return jsonify({'status': 'success', 'message': f'Grid of {source} flags shown'}), 200
+        else:
+            return jsonify({'status': 'error', 'message': f'Could not show a grid of {source} flags'}), 500
+    except Exception as e:
+        logging.error(f"Error showing grid: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+def _grid_request_args():
+    if request.is_json:
+        data = request.get_json()
+        return data.get('source', 'region'), data.get('shape'), _parse_force(data.get('force', False))
+    values = request.form if request.form else request.args
+    return values.get('source', 'region'), values.get('shape'), _parse_force(values.get('force', ''))
+
 # --- SECURE Endpoints under /secure/ ---
 @main.route('/secure/change-flag', methods=['POST'])
 def secure_change_flag():
@@ -110,11 +138,20 @@ def secure_change_flag():
     if request.is_json:
         data = request.get_json()
         country = data.get('country')
+        force = _parse_force(data.get('force', False))
     elif request.form:
         country = request.form.get('country')
+        force = _parse_force(request.form.get('force', ''))
     else:
         country = request.args.get('country')
-    return _change_flag_internal(country)
+        force = _parse_force(request.args.get('force', ''))
+    return _change_flag_internal(country, force)
+
+@main.route('/secure/show-grid', methods=['POST'])
+def secure_show_grid():
+    if not _require_token():
+        return jsonify({'status': 'error', 'message': 'Forbidden: Invalid or missing token'}), 403
+    return _show_grid_internal(*_grid_request_args())
 
 @main.route('/secure/current-flag', methods=['GET'])
 def secure_current_flag():
@@ -147,11 +184,20 @@ def change_flag():
     if request.is_json:
         data = request.get_json()
         country = data.get('country')
+        force = _parse_force(data.get('force', False))
     elif request.form:
         country = request.form.get('country')
+        force = _parse_force(request.form.get('force', ''))
     else:
         country = request.args.get('country')
-    return _change_flag_internal(country)
+        force = _parse_force(request.args.get('force', ''))
+    return _change_flag_internal(country, force)
+
+# OPEN endpoint for local use
+@main.route('/show-grid', methods=['POST'])
+def show_grid():
+    # No authentication required
+    return _show_grid_internal(*_grid_request_args())
 
 @main.route('/config', methods=['GET'])
 def get_config():
@@ -189,6 +235,7 @@ def save_config():
     config['flag_display']['update_at_startup'] = 'update_at_startup' in request.form
     config['flag_display']['mode'] = request.form.get('display_mode', 'random')
     config['flag_display']['fixed_country'] = request.form.get('fixed_country', '')
+    config['flag_display']['grid_source'] = request.form.get('grid_source', 'region')
     
     # Update display config
     config['display']['width'] = int(request.form.get('display_width', 800))
@@ -200,7 +247,7 @@ def save_config():
     # Update display manager configuration if available
     if DISPLAY_MODULE_AVAILABLE:
         try:
-            display_manager = get_display_manager(config.get('flag_display', {}))
+            display_manager = get_display_manager(dict(config.get('flag_display', {}), display=config.get('display', {})))
             # The display manager will reinitialize with the new configuration
         except Exception as e:
             logging.error(f"Error updating display manager: {e}")
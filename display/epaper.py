@@ -6,37 +6,187 @@ This module handles all direct interactions with the physical e-paper hardware.
 import os
 import time
 import logging
-from PIL import Image
+import importlib
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .refresh_policy import RefreshPolicy
+from .render_cache import RenderCache, render_settings_key
+from .frame_pack import FramePack
+from .quantize import DITHER_MODES, DITHER_AUTO, DEFAULT_DITHER, COLOR_METRICS, DEFAULT_METRIC
+from .flag_stats import FlagStats, DEFAULT_THRESHOLD
+from .layout import compose, layout_key, LAYOUTS, LAYOUT_STRETCH, LAYOUT_LETTERBOX, DEFAULT_LAYOUT
+from .grid import grid_geometry, render_tile, assemble_grid, compose_grid
+from .lazy_image import resolve_image
+from .panel_profiles import load_profile
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+def render_frame(profile, image, width, height, quantize=None, layout=LAYOUT_STRETCH, code=None):
+    """
+    Lay out, quantize and pack an image into a panel frame buffer.
+
+    Args:
+        profile (PanelProfile): The panel the frame is for.
+        image (PIL.Image or LazyImage): The image to render.
+        width (int): Frame width.
+        height (int): Frame height.
+        quantize (callable, optional): Quantizer mapping the image to palette indices.
+        layout (str, optional): How the image is placed on the panel, see display.layout.
+        code (str, optional): Country code of the flag, for the text of the card layout.
+
+    Returns:
+        bytearray: The packed frame buffer.
+    """
+    image = compose(resolve_image(image), width, height, layout, code)
+    return profile.render(image, quantize)
+
 class EPaperDisplay:
     """
-    Driver for Waveshare 7.3" E-Paper Display.
+    Driver for Waveshare E-Paper Displays, the 7.3" 7-color panel by default.
     Handles initialization, display updates, and error recovery.
     """
 
-    def __init__(self):
-        """Initialize the e-paper display driver."""
+    def __init__(self, settings=None):
+        """
+        Initialize the e-paper display driver.
+
+        Args:
+            settings (dict, optional): The ``display`` section of the configuration.
+                Its ``panel`` and ``rotation`` keys select the panel profile (see
+                display.panel_profiles) for the lifetime of the driver.
+        """
         self._epd = None
-        self.width = 800  # Default width
-        self.height = 480  # Default height
+        # Resolution, palette and packing of the panel; frames are rendered for it
+        self.profile = load_profile(settings)
+        self.width = self.profile.width
+        self.height = self.profile.height
+        self._size_warned = False
         self.initialized = False
+        # Whether the panel has been woken (reset/initialized) since it last slept
+        self.awake = False
+        # Resizes and packs upcoming frames while the panel is busy
+        self._frame_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="frame-prep")
+        self.busy_timeouts = {}
+        self.busy_retries = 1
+        self.spi_speed_hz = None
+        self.spi_chunk_size = None
+        self.warm_session = False
+        self.backend = 'auto'
+        self.sim_time_scale = 1.0
+        # How flags are quantized and placed on the panel; part of the render cache key
+        self.dither = DEFAULT_DITHER
+        self.color_metric = DEFAULT_METRIC
+        self.layout = DEFAULT_LAYOUT
+        self.auto_dither_threshold = DEFAULT_THRESHOLD
+        # Per-flag color stats, used to pick the dither mode with ``dither: auto``
+        self.flag_stats = None
+        # Worker processes for the render stages; set by DisplayManager
+        self.render_pool = None
+        self.render_cache = None
+        self.frame_pack = None
+        # Decides when a clearing refresh is due to remove ghosting
+        self.refresh_policy = RefreshPolicy.from_config(settings, panel=self.profile.name,
+                                                     bits_per_pixel=self.profile.bits_per_pixel)
+        self.configure(settings)
         self._initialize()
 
+    def configure(self, settings):
+        """
+        Apply driver tuning from the ``display`` configuration section.
+
+        Args:
+            settings (dict): May contain
+                ``busy_timeouts`` (seconds per BUSY phase, keyed by ``reset``,
+                ``power_on``, ``refresh`` and ``power_off``),
+                ``busy_retries`` (hardware resets attempted after a BUSY timeout),
+                ``spi_speed_hz`` (SPI clock), ``spi_chunk_size`` (bytes per transfer),
+                ``warm_session`` (keep SPI/GPIO open between updates),
+                ``backend`` (``"auto"`` to probe the board or ``"simulated"`` for the
+                software panel model), ``sim_time_scale`` (speed factor of the
+                simulated timings), ``clear_every`` / ``ghosting_threshold``
+                (when to insert a clearing refresh, see RefreshPolicy), and
+                ``render_cache`` / ``render_cache_mb`` (on-disk cache of packed
+                frames, see RenderCache), ``frame_pack`` (use the memory-mapped
+                pack of all flags, see FramePack), ``dither`` (``none``,
+                ``ordered`` or ``floyd-steinberg``, see Quantizer, or ``auto`` to
+                pick one per flag, see FlagStats), ``auto_dither_threshold``
+                (largest mapping error shown without dithering),
+                ``color_metric`` (``lab`` or ``rgb`` distance for the palette
+                lookup table), and ``layout`` (``stretch``, ``letterbox`` or
+                ``card``, see display.layout).
+        """
+        settings = settings or {}
+        self.busy_timeouts = {
+            phase.upper(): timeout
+            for phase, timeout in settings.get('busy_timeouts', {}).items()
+        }
+        self.busy_retries = int(settings.get('busy_retries', self.busy_retries))
+        self.spi_speed_hz = settings.get('spi_speed_hz')
+        self.spi_chunk_size = settings.get('spi_chunk_size')
+        self.warm_session = bool(settings.get('warm_session', False))
+        self.backend = settings.get('backend', 'auto')
+        self.sim_time_scale = float(settings.get('sim_time_scale', 1.0))
+        dither = settings.get('dither', DEFAULT_DITHER)
+        if dither not in DITHER_MODES + (DITHER_AUTO,):
+            logger.warning(f"Unknown dither mode {dither!r}, using {DEFAULT_DITHER}")
+            dither = DEFAULT_DITHER
+        color_metric = settings.get('color_metric', DEFAULT_METRIC)
+        if color_metric not in COLOR_METRICS:
+            logger.warning(f"Unknown color metric {color_metric!r}, using {DEFAULT_METRIC}")
+            color_metric = DEFAULT_METRIC
+        layout = settings.get('layout', DEFAULT_LAYOUT)
+        if layout not in LAYOUTS:
+            logger.warning(f"Unknown layout {layout!r}, using {DEFAULT_LAYOUT}")
+            layout = DEFAULT_LAYOUT
+        self.layout = layout
+        self.dither = dither
+        self.color_metric = color_metric
+        self.auto_dither_threshold = float(settings.get('auto_dither_threshold', DEFAULT_THRESHOLD))
+        self.flag_stats = None
+        self.refresh_policy.configure(settings)
+        self.render_cache = RenderCache.from_config(settings)
+        if self.frame_pack is not None:
+            self.frame_pack.close()
+        self.frame_pack = FramePack.from_config(settings)
+        if self._epd:
+            self._apply_driver_settings()
+
+    def _apply_driver_settings(self):
+        """Push the configured timeouts and SPI tuning down to the driver."""
+        from waveshare_epd import epdconfig
+
+        if self.backend == 'simulated':
+            if not isinstance(epdconfig.implementation, epdconfig.Simulated):
+                epdconfig.use_implementation(epdconfig.Simulated())
+            epdconfig.sim_configure(time_scale=self.sim_time_scale)
+        self._epd.busy_timeouts.update(self.busy_timeouts)
+        epdconfig.spi_configure(speed_hz=self.spi_speed_hz, chunk_size=self.spi_chunk_size)
+
     def _initialize(self):
         """
         Initialize the display hardware.
         This is separated from __init__ to allow for retry logic.
         """
         try:
+            # The board is probed when epdconfig is first imported, so the
+            # simulated backend has to be requested before that
+            if self.backend == 'simulated':
+                os.environ['EPD_BACKEND'] = 'simulated'
+
             # Import waveshare module dynamically to avoid import issues
-            from waveshare_epd import epd7in3f
-            self._epd = epd7in3f.EPD()
-            self.width = self._epd.width
-            self.height = self._epd.height
-            logger.info("E-Paper display driver initialized")
+            driver = importlib.import_module(f"waveshare_epd.{self.profile.driver}")
+            self._epd = driver.EPD()
+            self._apply_driver_settings()
+            if (self._epd.width, self._epd.height) != (self.profile.native_width,
+                                                       self.profile.native_height):
+                logger.warning(f"Driver {self.profile.driver} reports {self._epd.width}x"
+                               f"{self._epd.height}, panel profile says "
+                               f"{self.profile.native_width}x{self.profile.native_height}")
+            # Quantization tables and the clear frame are built once, up front
+            self.profile.prepare(DITHER_MODES if self.dither == DITHER_AUTO else (self.dither,),
+                                 self.color_metric)
+            logger.info(f"E-Paper display driver initialized ({self.profile.name})")
             self.initialized = True
             return True
         except Exception as e:
@@ -56,6 +206,7 @@ class EPaperDisplay:
                 
         try:
             self._epd.reset()
+            self.awake = True
             time.sleep(0.1)  # Short delay after reset
             logger.debug("Display reset complete")
             return True
@@ -75,7 +226,10 @@ class EPaperDisplay:
                 return False
                 
         try:
-            self._epd.init()
+            if self._run_with_recovery(self._epd.init) != 0:
+                logger.error("Display module could not be opened")
+                return False
+            self.awake = True
             logger.debug("Display initialized for updates")
             return True
         except Exception as e:
@@ -83,14 +237,230 @@ class EPaperDisplay:
             self.initialized = False
             return False
 
-    def display_image(self, image, custom_width=None, custom_height=None):
+    def prepare_frame(self, image, custom_width=None, custom_height=None, cache_key=None):
         """
-        Display an image on the e-paper display.
+        Resize, quantize and pack an image into a panel frame buffer.
+        Pure CPU work that does not touch the hardware, so it may run
+        while another frame is being sent to the panel.
         
         Args:
-            image (PIL.Image): The image to display. Will be resized to fit the display.
+            image (PIL.Image or LazyImage): The image to display. A LazyImage is only
+                loaded if the frame has to be rendered.
+            custom_width (int, optional): Custom display width to override the default.
+            custom_height (int, optional): Custom display height to override the default.
+            cache_key (str, optional): Country code of the flag; enables the frame pack
+                and the render cache. An image opened from a file is revalidated
+                against that file.
+            
+        Returns:
+            bytes-like: The packed frame buffer; a zero-copy memoryview when it
+                comes from the frame pack.
+        """
+        target_width, target_height = self.frame_size(custom_width, custom_height)
+
+        # configure() may replace the caches while a frame is being prepared
+        render_cache = self.render_cache
+        frame_pack = self.frame_pack
+        render_pool = self.render_pool
+        key = None
+        if cache_key:
+            settings_key = self.render_settings_key(target_width, target_height)
+            source = getattr(image, 'filename', None) or None
+            if frame_pack is not None:
+                frame = frame_pack.get(cache_key, settings_key, source)
+                if frame is not None:
+                    logger.debug(f"Frame for {cache_key} mapped from frame pack")
+                    return frame
+            if render_cache is not None:
+                key = f"{cache_key.lower()}-{settings_key}"
+                frame = render_cache.get(key, source)
+                if frame is not None:
+                    logger.debug(f"Frame for {cache_key} loaded from render cache")
+                    return frame
+            
+        frame = None
+        image = resolve_image(image)
+        if key is not None and (getattr(image, 'filename', None) or None) != source:
+            # The loader fell back to another file; entries are stamped from it
+            source = getattr(image, 'filename', None) or None
+            frame = render_cache.get(key, source)
+            if frame is not None:
+                logger.debug(f"Frame for {cache_key} loaded from render cache")
+                return frame
+        dither = self.dither_for(image, cache_key)
+        if render_pool is not None:
+            try:
+                frame = render_pool.render(image, target_width, target_height,
+                                                dither, self.color_metric,
+                                                self.layout, cache_key, self.profile)
+            except Exception as e:
+                logger.warning(f"Render worker failed ({e}), rendering in-process")
+        if frame is None:
+            frame = render_frame(self.profile, image, target_width, target_height,
+                                 self.get_quantizer(dither), self.layout, cache_key)
+            
+        logger.debug(f"Frame prepared at size: {target_width}x{target_height}")
+        if key is not None:
+            render_cache.put(key, frame, source)
+        return frame
+
+    @property
+    def quantizer(self):
+        """The Quantizer for the configured dither mode, created on first use."""
+        return self.get_quantizer(DEFAULT_DITHER if self.dither == DITHER_AUTO else self.dither)
+
+    def get_quantizer(self, dither):
+        """Return the panel profile's Quantizer of a dither mode."""
+        return self.profile.quantizer(dither, self.color_metric)
+
+    def frame_size(self, custom_width=None, custom_height=None):
+        """
+        Return the size frames are composed at.
+        A configured size the panel profile cannot show is ignored.
+
+        Args:
+            custom_width (int, optional): Configured display width.
+            custom_height (int, optional): Configured display height.
+
+        Returns:
+            tuple: (width, height) of the panel as mounted.
+        """
+        width = custom_width if custom_width is not None else self.width
+        height = custom_height if custom_height is not None else self.height
+        if (width, height) != (self.width, self.height):
+            if not self._size_warned:
+                logger.warning(f"Configured size {width}x{height} does not match panel "
+                               f"{self.profile.name} ({self.width}x{self.height}, rotation "
+                               f"{self.profile.rotation}); using the panel size")
+                self._size_warned = True
+        return self.width, self.height
+
+    def dither_for(self, image, code=None):
+        """
+        Return the dither mode to render a flag with.
+        With ``dither: auto`` it is chosen from the flag's color stats.
+
+        Args:
+            image (PIL.Image): The flag image.
+            code (str, optional): Country code of the flag.
+
+        Returns:
+            str: One of DITHER_MODES.
+        """
+        if self.dither != DITHER_AUTO:
+            return self.dither
+        if self.flag_stats is None:
+            self.flag_stats = FlagStats(self.profile.palette, self.color_metric,
+                                        self.auto_dither_threshold)
+        dither = self.flag_stats.dither_for(code, image)
+        logger.debug(f"Dither mode for {code}: {dither}")
+        return dither
+
+    def _dither_key(self):
+        """The dither part of render cache keys; per-flag choices follow from the threshold."""
+        if self.dither == DITHER_AUTO:
+            return f"{DITHER_AUTO}{self.auto_dither_threshold:g}"
+        return self.dither
+
+    def render_settings_key(self, width=None, height=None):
+        """
+        Get the render settings part of frame cache keys for the current settings.
+
+        Returns:
+            str: Key from render_settings_key.
+        """
+        layout = layout_key(self.layout)
+        if self.profile.rotation:
+            layout = f"{layout}-rot{self.profile.rotation}"
+        return render_settings_key(width or self.width, height or self.height,
+                                   self.profile.palette, self._dither_key(), layout,
+                                   self.color_metric)
+
+    def prepare_grid(self, flags, columns, rows, custom_width=None, custom_height=None):
+        """
+        Render several flags into one packed grid frame.
+        Each flag's packed tile is taken from the render cache when possible,
+        so a grid of flags shown before is only copied together. On a rotated
+        panel the tiles are not contiguous in the packed frame, so the grid is
+        composed and rendered as a whole instead.
+
+        Args:
+            flags (list): (country code, PIL.Image or LazyImage) pairs, row by row.
+            columns (int): Tiles per row.
+            rows (int): Tiles per column.
             custom_width (int, optional): Custom display width to override the default.
             custom_height (int, optional): Custom display height to override the default.
+
+        Returns:
+            bytearray: The packed frame buffer.
+        """
+        profile = self.profile
+        target_width, target_height = self.frame_size(custom_width, custom_height)
+        if profile.rotation:
+            image = compose_grid([image for _, image in flags], target_width, target_height,
+                                 columns, rows, profile.pixels_per_byte)
+            return profile.render(image, self.quantizer)
+
+        tile_width, tile_height, positions = grid_geometry(target_width, target_height, columns, rows,
+                                                           profile.pixels_per_byte)
+        settings_key = render_settings_key(tile_width, tile_height, profile.palette, self._dither_key(),
+                                           layout_key(LAYOUT_LETTERBOX), self.color_metric)
+        render_cache = self.render_cache
+        tiles = []
+        for code, image in flags[:len(positions)]:
+            key = f"{code.lower()}-tile-{settings_key}"
+            source = getattr(image, 'filename', None) or None
+            tile = render_cache.get(key, source) if render_cache is not None else None
+            if tile is None:
+                image = resolve_image(image)
+                source = getattr(image, 'filename', None) or None
+                quantizer = self.get_quantizer(self.dither_for(image, code))
+                tile = render_tile(image, tile_width, tile_height, quantizer, profile.pack)
+                if render_cache is not None:
+                    render_cache.put(key, tile, source)
+            tiles.append(tile)
+        logger.debug(f"Grid of {len(tiles)} flags prepared at {tile_width}x{tile_height} per tile")
+        return assemble_grid(tiles, target_width, target_height, tile_width, tile_height, positions,
+                             profile.bits_per_pixel, profile.clear_buffer()[0])
+
+    def submit_grid(self, flags, columns, rows, custom_width=None, custom_height=None):
+        """
+        Start preparing a grid frame on the frame preparation thread.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the packed frame buffer.
+        """
+        if not self._epd:
+            if not self._initialize():
+                raise RuntimeError("Display driver not initialized")
+        return self._frame_executor.submit(self.prepare_grid, flags, columns, rows,
+                                           custom_width, custom_height)
+
+    def submit_frame(self, image, custom_width=None, custom_height=None, cache_key=None):
+        """
+        Start preparing a frame on the frame preparation thread.
+        
+        Returns:
+            concurrent.futures.Future: Resolves to the packed frame buffer.
+        """
+        if not self._epd:
+            if not self._initialize():
+                raise RuntimeError("Display driver not initialized")
+        return self._frame_executor.submit(self.prepare_frame, image, custom_width, custom_height,
+                                           cache_key)
+
+    def display_frame(self, frame, force_refresh=False):
+        """
+        Initialize the panel and send a frame to it.
+        The panel reset and register setup run before the frame is needed,
+        so a frame still being prepared by submit_frame overlaps with them.
+        Frames identical to the one already on the panel are not refreshed;
+        if that is known before the panel is initialized, the panel is not
+        touched at all and ``awake`` stays False, so it needs no sleep() either.
+        
+        Args:
+            frame: A packed frame buffer, or a Future from submit_frame.
+            force_refresh (bool, optional): Refresh even if the frame is unchanged.
             
         Returns:
             bool: True if successful, False otherwise
@@ -101,21 +471,18 @@ class EPaperDisplay:
                 return False
                 
         try:
-            # Ensure display is initialized
-            if not self.init():
+            # A frame that is already prepared can be checked without touching the panel
+            ready = not isinstance(frame, Future) or frame.done()
+            if ready and not force_refresh and self.refresh_policy.is_unchanged(self._resolve(frame)):
+                logger.info("Panel already shows this frame - skipping refresh")
+                return True
+
+            # Initialize the panel and display the frame, resetting if it hangs
+            if not self._run_with_recovery(self._refresh, frame, force_refresh):
                 return False
-                
-            # Use custom dimensions if provided, otherwise use hardware defaults
-            target_width = custom_width if custom_width is not None else self.width
-            target_height = custom_height if custom_height is not None else self.height
-                
-            # Resize image if needed
-            if image.size != (target_width, target_height):
-                image = image.resize((target_width, target_height), Image.Resampling.LANCZOS)
-                
-            # Display the image
-            self._epd.display(self._epd.getbuffer(image))
-            logger.info(f"Image displayed successfully at size: {target_width}x{target_height}")
+            logger.info("Frame displayed successfully")
+            logger.debug("Busy phases: " + ", ".join(
+                f"{phase} {seconds:.2f}s" for phase, seconds in self.busy_durations.items()))
             return True
         except Exception as e:
             logger.error(f"Error displaying image: {e}")
@@ -125,29 +492,132 @@ class EPaperDisplay:
             except:
                 pass
             return False
+
+    def display_image(self, image, custom_width=None, custom_height=None):
+        """
+        Display an image on the e-paper display.
+        
+        Args:
+            image (PIL.Image): The image to display. Placed on the panel with the configured layout.
+            custom_width (int, optional): Custom display width to override the default.
+            custom_height (int, optional): Custom display height to override the default.
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            frame = self.submit_frame(image, custom_width, custom_height)
+        except Exception as e:
+            logger.error(f"Cannot update display - {e}")
+            return False
+        return self.display_frame(frame)
             
-    def sleep(self):
+    @staticmethod
+    def _resolve(frame):
+        """Return the frame buffer, waiting for it if it is still being prepared."""
+        return frame.result() if isinstance(frame, Future) else frame
+
+    def _refresh(self, frame, force_refresh=False):
+        """
+        Initialize the panel registers and send a packed frame buffer.
+
+        Args:
+            frame: A packed frame buffer, or a Future resolving to one.
+            force_refresh (bool, optional): Refresh even if the frame is unchanged.
+
+        Returns:
+            bool: True if the frame was sent, False if the module could not be opened.
+        """
+        if self._epd.init() != 0:
+            logger.error("Display module could not be opened")
+            return False
+        self.awake = True
+        # Only now wait for the frame; it was prepared while the panel reset
+        buffer = self._resolve(frame)
+        if not force_refresh and self.refresh_policy.is_unchanged(buffer):
+            logger.info("Panel already shows this frame - skipping refresh")
+            return True
+        if self.refresh_policy.needs_clear():
+            logger.info("Ghosting threshold reached - clearing display before update")
+            self._epd.Clear()
+            self.refresh_policy.record_clear(self.profile.clear_buffer())
+        self._epd.display(buffer)
+        self.refresh_policy.record_refresh(buffer)
+        return True
+
+    def _run_with_recovery(self, operation, *args):
+        """
+        Run a driver operation, resetting the panel and retrying if it hangs busy.
+
+        Raises:
+            EPDBusyTimeout: If the panel is still busy after all retries.
+        """
+        EPDBusyTimeout = importlib.import_module(f"waveshare_epd.{self.profile.driver}").EPDBusyTimeout
+
+        for attempt in range(self.busy_retries + 1):
+            try:
+                return operation(*args)
+            except EPDBusyTimeout as e:
+                if attempt >= self.busy_retries:
+                    raise
+                logger.warning(f"{e}; resetting display and retrying "
+                               f"({attempt + 1}/{self.busy_retries})")
+                if not self.reset():
+                    raise
+
+    @property
+    def busy_durations(self):
+        """
+        Get how long each BUSY phase of the last update took.
+
+        Returns:
+            dict: Seconds spent waiting, keyed by phase name.
+        """
+        if not self._epd:
+            return {}
+        return dict(self._epd.busy_durations)
+
+    def sleep(self, keep_open=None):
         """
         Put the display to sleep to save power.
         Should be called after updates are complete.
+
+        Args:
+            keep_open (bool, optional): Keep SPI/GPIO open so the next update can skip
+                module setup. Defaults to the ``warm_session`` setting.
         """
         if not self._epd:
             return False
             
+        if keep_open is None:
+            keep_open = self.warm_session
+
+        if not self.awake:
+            # Nothing was sent since the last sleep; DEEP_SLEEP would go to an
+            # SPI device this process may never have opened
+            if not keep_open and self._epd.module_open:
+                from waveshare_epd import epdconfig
+                epdconfig.module_exit()
+                self._epd.module_open = False
+            logger.debug("Display not woken since last sleep - nothing to do")
+            return True
+
         try:
             # Try to re-initialize if needed before sleeping
             if not self.initialized:
                 self._initialize()
                 
-            self._epd.sleep()
-            logger.debug("Display put to sleep")
+            self._epd.sleep(keep_open=keep_open)
+            self.awake = False
+            logger.debug("Display put to sleep" + (" (module kept open)" if keep_open else ""))
             return True
         except Exception as e:
             logger.error(f"Error putting display to sleep: {e}")
             # Try to reset the hardware connection
             try:
-                from waveshare_epd import epd7in3f
-                epd7in3f.epdconfig.module_exit()
+                from waveshare_epd import epdconfig
+                epdconfig.module_exit()
+                self.awake = False
                 time.sleep(0.5)  # Give hardware time to reset
                 self._initialize()  # Attempt to re-initialize
                 return True  # Return success even if sleep failed but we recovered
@@ -162,9 +632,11 @@ class EPaperDisplay:
         Close the display and free resources.
         Should be called when done with the display.
         """
+        if self.frame_pack is not None:
+            self.frame_pack.close()
         try:
             if self._epd:
-                self.sleep()
+                self.sleep(keep_open=False)
                 self._epd = None
                 self.initialized = False
             return True
@@ -0,0 +1,254 @@
+"""
+Single-file atlas of pre-decoded flag images.
+Every flag in flag_cache/ is stored as uncompressed RGB pixels in one
+memory-mapped file, so looking a flag up costs no PNG inflate: the pixels are
+handed out as a zero-copy NumPy view, or copied once into a PIL image.
+
+Layout (little endian):
+    header   magic, version, entry count
+    index    one fixed-size record per flag: code, offset, width, height,
+             source PNG mtime/size
+    pixels   the RGB images (width * height * 3 bytes each), back to back
+"""
+
+import os
+import mmap
+import struct
+import logging
+import threading
+
+from PIL import Image
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .render_cache import BASE_DIR, RENDER_CACHE_DIR, source_stamp
+from .layout import flatten
+
+logger = logging.getLogger(__name__)
+
+FLAG_CACHE_DIR = os.path.join(BASE_DIR, "flag_cache")
+ATLAS_FILE = os.path.join(RENDER_CACHE_DIR, "flags.atlas")
+
+MAGIC = b"FLAGATLS"
+# 2: transparent pixels are stored as the panel background
+VERSION = 2
+# magic, version, entry count
+HEADER = struct.Struct("<8sHI")
+# code, offset, width, height, source mtime_ns, source size
+ENTRY = struct.Struct("<8sQIIqQ")
+
+
+def find_flags(flag_dir=FLAG_CACHE_DIR):
+    """
+    Find the cached flag images named after a country code (e.g. ``no.png``).
+
+    Returns:
+        dict: Image path keyed by lower-case country code.
+    """
+    flags = {}
+    for name in sorted(os.listdir(flag_dir)):
+        code, ext = os.path.splitext(name)
+        if ext == '.png' and code.isalpha() and len(code) <= 3:
+            flags[code.lower()] = os.path.join(flag_dir, name)
+    return flags
+
+
+def build_flag_atlas(sources, path=ATLAS_FILE):
+    """
+    Decode flag images and write them into an atlas file, replacing any
+    existing one atomically. Images are decoded one at a time.
+
+    Args:
+        sources (dict): Source image path keyed by country code.
+        path (str, optional): Path of the atlas file.
+
+    Returns:
+        int: Number of images written.
+    """
+    codes = sorted(code.lower() for code in sources)
+    paths = {code.lower(): source for code, source in sources.items()}
+    for code in codes:
+        if len(code.encode()) > 8:
+            raise ValueError(f"Country code {code!r} does not fit the atlas index")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    index = []
+    with open(tmp_path, 'wb') as f:
+        # Write the pixels first and fill in the header and index afterwards
+        offset = HEADER.size + ENTRY.size * len(codes)
+        f.seek(offset)
+        for code in codes:
+            source = paths[code]
+            stamp = source_stamp(source) or (0, 0)
+            with Image.open(source) as img:
+                image = flatten(img)
+            f.write(image.tobytes())
+            index.append(ENTRY.pack(code.encode(), offset, image.width, image.height, *stamp))
+            offset += image.width * image.height * 3
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(index)))
+        f.writelines(index)
+    os.replace(tmp_path, path)
+    logger.info(f"Wrote {len(index)} flag images to {path}")
+    return len(index)
+
+
+class FlagAtlas:
+    """
+    Read-only view of an atlas file. The file is re-mapped when it is
+    replaced by a rebuild, so a long-running server picks up new atlases.
+    """
+
+    def __init__(self, path=ATLAS_FILE):
+        """
+        Initialize the atlas reader; the file is opened on first use.
+
+        Args:
+            path (str, optional): Path of the atlas file.
+        """
+        self.path = path
+        self._map = None
+        self._index = {}
+        self._identity = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, settings):
+        """
+        Create an atlas reader from the ``display`` configuration section.
+
+        Args:
+            settings (dict): May contain ``flag_atlas`` (False disables the atlas).
+
+        Returns:
+            FlagAtlas: The reader, or None if the atlas is disabled.
+        """
+        settings = settings or {}
+        if not settings.get('flag_atlas', True):
+            return None
+        return cls()
+
+    def get_pixels(self, code, source=None):
+        """
+        Look up the pixels of one flag.
+
+        Args:
+            code (str): Country code (cca2) of the flag.
+            source (str, optional): Path of the image the atlas entry must match.
+
+        Returns:
+            tuple: (memoryview of the RGB bytes, width, height), or None if the
+                atlas has no up-to-date image for this source.
+        """
+        with self._lock:
+            if not self._refresh():
+                return None
+            entry = self._index.get(code.lower())
+            if entry is None:
+                return None
+            offset, width, height, mtime_ns, size = entry
+            if [mtime_ns, size] != (source_stamp(source) or [0, 0]):
+                logger.debug(f"Flag atlas entry for {code} is stale")
+                return None
+            return memoryview(self._map)[offset:offset + width * height * 3], width, height
+
+    def get_array(self, code, source=None):
+        """
+        Return a flag as a read-only ``(height, width, 3)`` uint8 NumPy array
+        viewing the atlas, or None. Needs NumPy.
+        """
+        if np is None:
+            raise RuntimeError("NumPy is required for array views of the flag atlas")
+        pixels = self.get_pixels(code, source)
+        if pixels is None:
+            return None
+        view, width, height = pixels
+        return np.frombuffer(view, dtype=np.uint8).reshape(height, width, 3)
+
+    def get_image(self, code, source=None):
+        """
+        Return a flag as an RGB PIL image, or None.
+        PIL only maps 4-byte-per-pixel modes in place, so the RGB pixels are
+        copied out of the atlas; use get_array for a view without the copy.
+        """
+        pixels = self.get_pixels(code, source)
+        if pixels is None:
+            return None
+        view, width, height = pixels
+        image = Image.frombuffer('RGB', (width, height), view, 'raw', 'RGB', 0, 1)
+        # The render cache and frame pack validate frames against their source file
+        image.filename = source
+        return image
+
+    def is_current(self, sources):
+        """
+        Check whether the atlas matches the flag images.
+
+        Args:
+            sources (dict): Source image path keyed by country code.
+
+        Returns:
+            bool: False if the atlas is missing or needs a rebuild.
+        """
+        with self._lock:
+            if not self._refresh():
+                return False
+            stamps = {code.lower(): source_stamp(path) or [0, 0] for code, path in sources.items()}
+            if set(self._index) != set(stamps):
+                return False
+            return all([entry[3], entry[4]] == stamps[code] for code, entry in self._index.items())
+
+    def close(self):
+        """Unmap the atlas file."""
+        with self._lock:
+            self._unmap()
+
+    def _refresh(self):
+        """Map the atlas file, re-mapping it if it was replaced. Returns True if mapped."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self._unmap()
+            return False
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if identity == self._identity:
+            return self._map is not None
+        self._unmap()
+        self._identity = identity
+        atlas = None
+        try:
+            with open(self.path, 'rb') as f:
+                atlas = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, count = HEADER.unpack_from(atlas, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("not a flag atlas or unsupported version")
+            index = {}
+            for i in range(count):
+                code, *entry = ENTRY.unpack_from(atlas, HEADER.size + i * ENTRY.size)
+                if entry[0] + entry[1] * entry[2] * 3 > len(atlas):
+                    raise ValueError(f"entry {i} extends past the end of the file")
+                index[code.rstrip(b'\0').decode()] = tuple(entry)
+        except (OSError, ValueError, struct.error) as e:
+            logger.error(f"Cannot read flag atlas {self.path}: {e}")
+            if atlas is not None:
+                atlas.close()
+            return False
+        self._map = atlas
+        self._index = index
+        logger.debug(f"Mapped flag atlas with {count} images")
+        return True
+
+    def _unmap(self):
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # An array view is still in use; the mapping is freed with it
+                pass
+        self._map = None
+        self._index = {}
+        self._identity = None
@@ -0,0 +1,243 @@
+"""
+Per-flag color statistics and automatic dither selection.
+Most flags are a few flat colors that map cleanly to the panel palette
+without dithering; a few (coats of arms, gradients) lose detail unless they
+are dithered. scripts/analyze_flags.py measures every flag once, from the same SVG or PNG
+the render path loads, and stores
+the results in a small sidecar index (render_cache/flag_stats.json); with
+``dither: auto`` the render path picks the cheapest mode that meets the
+quality threshold for each flag from it.
+
+Per flag the index holds:
+    hist            share of pixels mapped to each palette color
+    fit_error       mean CIE76 distance to the nearest panel color
+    mapping_error   mean distance of each pixel to the average color of all
+                    pixels mapped to the same palette color: the structure
+                    nearest-color mapping loses (0 for a flat-colored flag)
+    edges           share of neighbouring pixel pairs that differ visibly
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .quantize import (get_lut, srgb_to_lab, LUT_BITS, DEFAULT_METRIC,
+                       DITHER_NONE, DITHER_ORDERED, DITHER_FLOYD_STEINBERG, DEFAULT_DITHER)
+from .render_cache import RENDER_CACHE_DIR, source_stamp
+
+logger = logging.getLogger(__name__)
+
+STATS_FILE = os.path.join(RENDER_CACHE_DIR, "flag_stats.json")
+VERSION = 1
+
+# Mean mapping error (CIE76) up to which a flag is shown without dithering
+DEFAULT_THRESHOLD = 3.0
+# Color distance between neighbouring pixels that counts as an edge
+EDGE_DELTA = 10.0
+# Flags with fewer edges than this are smooth enough for ordered dithering
+SMOOTH_EDGES = 0.02
+
+
+def analyze_image(image, palette, metric=DEFAULT_METRIC):
+    """
+    Measure how well an image maps to the panel palette.
+
+    Args:
+        image (PIL.Image): The flag image.
+        palette (sequence): The panel colors the lookup table maps to, as (r, g, b) tuples.
+        metric (str, optional): Metric of the lookup table the quantizer uses.
+
+    Returns:
+        dict: hist, fit_error, mapping_error and edges, see the module docstring.
+    """
+    pixels = np.asarray(image.convert("RGB"))
+    shift = 8 - LUT_BITS
+    lut = get_lut(palette, metric=metric)
+    bins = pixels >> shift
+    indices = lut[bins[..., 0], bins[..., 1], bins[..., 2]].ravel()
+
+    lab = srgb_to_lab(pixels).reshape(-1, 3)
+    colors = srgb_to_lab(np.array(palette, dtype=np.float64))
+    fit_error = np.sqrt(((lab - colors[indices]) ** 2).sum(axis=1)).mean()
+
+    counts = np.bincount(indices, minlength=len(palette))
+    sums = np.stack([np.bincount(indices, weights=lab[:, c], minlength=len(palette))
+                     for c in range(3)], axis=1)
+    means = sums / np.maximum(counts, 1)[:, None]
+    mapping_error = np.sqrt(((lab - means[indices]) ** 2).sum(axis=1)).mean()
+
+    grid = lab.reshape(pixels.shape)
+    horizontal = np.sqrt(((grid[:, 1:] - grid[:, :-1]) ** 2).sum(axis=-1)) > EDGE_DELTA
+    vertical = np.sqrt(((grid[1:] - grid[:-1]) ** 2).sum(axis=-1)) > EDGE_DELTA
+    edges = (horizontal.sum() + vertical.sum()) / max(1, horizontal.size + vertical.size)
+
+    return {
+        'hist': [round(float(share), 4) for share in counts / counts.sum()],
+        'fit_error': round(float(fit_error), 2),
+        'mapping_error': round(float(mapping_error), 2),
+        'edges': round(float(edges), 4),
+    }
+
+
+def choose_dither(stats, threshold=DEFAULT_THRESHOLD):
+    """
+    Pick the cheapest dither mode that shows a flag well enough.
+
+    Args:
+        stats (dict): Result of analyze_image.
+        threshold (float, optional): Largest mapping error shown without dithering.
+
+    Returns:
+        str: ``none`` for flags nearest-color mapping keeps intact, ``ordered``
+            for smooth shading, ``floyd-steinberg`` for detailed artwork.
+    """
+    if stats['mapping_error'] <= threshold:
+        return DITHER_NONE
+    if stats['edges'] < SMOOTH_EDGES:
+        return DITHER_ORDERED
+    return DITHER_FLOYD_STEINBERG
+
+
+def build_flag_stats(sources, palette, metric=DEFAULT_METRIC, path=STATS_FILE, load=None):
+    """
+    Analyze flag images and write the stats index, replacing it atomically.
+
+    Args:
+        sources (dict): Source image path keyed by country code.
+        palette (sequence): Colors the lookup table maps to, see analyze_image.
+        metric (str, optional): Metric of the lookup table.
+        path (str, optional): Path of the index file.
+        load (callable, optional): Returns the image of a country code as the
+            render path loads it; its ``filename`` is the source the entry is
+            stamped with. Defaults to opening the source path.
+
+    Returns:
+        dict: Stats keyed by lower-case country code.
+    """
+    from PIL import Image
+
+    flags = {}
+    for code, source in sorted(sources.items()):
+        if load is None:
+            with Image.open(source) as img:
+                stats = analyze_image(img, palette, metric)
+        else:
+            img = load(code)
+            if img is None:
+                logger.warning(f"Could not load the flag of {code}, skipping")
+                continue
+            stats = analyze_image(img, palette, metric)
+            source = getattr(img, 'filename', None) or source
+        stats['source_stamp'] = source_stamp(source)
+        flags[code.lower()] = stats
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'version': VERSION, 'palette': [list(c) for c in palette], 'metric': metric,
+                   'created': time.strftime("%Y-%m-%d %H:%M:%S"), 'flags': flags},
+                  f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    logger.info(f"Wrote color stats of {len(flags)} flags to {path}")
+    return flags
+
+
+class FlagStats:
+    """
+    Read access to the stats index, with in-memory analysis of flags that
+    are missing from it (or whose image changed since it was built).
+    """
+
+    def __init__(self, palette, metric=DEFAULT_METRIC, threshold=DEFAULT_THRESHOLD, path=STATS_FILE):
+        """
+        Initialize the stats reader; the index is loaded on first use.
+
+        Args:
+            palette (sequence): Colors the lookup table maps to, see analyze_image.
+            metric (str, optional): Metric of the lookup table.
+            threshold (float, optional): See choose_dither.
+            path (str, optional): Path of the index file.
+        """
+        self.palette = tuple(map(tuple, palette))
+        self.metric = metric
+        self.threshold = threshold
+        self.path = path
+        self._flags = {}
+        self._identity = None
+        self._analyzed = {}
+        self._lock = threading.Lock()
+
+    def get(self, code, image=None):
+        """
+        Return the stats of a flag.
+
+        Args:
+            code (str): Country code (cca2).
+            image (PIL.Image, optional): The flag image; analyzed if the index has
+                no current entry for it.
+
+        Returns:
+            dict or None: The stats, or None if they are unknown.
+        """
+        if np is None:
+            return None
+        source = getattr(image, 'filename', None) or None
+        stamp = source_stamp(source)
+        key = code.lower()
+        with self._lock:
+            self._refresh()
+            stats = self._flags.get(key)
+            if stats is not None and stamp is not None and stats.get('source_stamp') == stamp:
+                return stats
+            stats = self._analyzed.get((key, source))
+            if stats is not None and stats.get('source_stamp') == stamp:
+                return stats
+        if image is None:
+            return None
+        stats = analyze_image(image, self.palette, self.metric)
+        stats['source_stamp'] = stamp
+        with self._lock:
+            self._analyzed[(key, source)] = stats
+        logger.debug(f"Analyzed colors of {code}: {stats}")
+        return stats
+
+    def dither_for(self, code, image=None):
+        """
+        Return the dither mode for a flag, or DEFAULT_DITHER if its stats are unknown.
+        """
+        stats = self.get(code, image) if code else None
+        if stats is None:
+            return DEFAULT_DITHER
+        return choose_dither(stats, self.threshold)
+
+    def _refresh(self):
+        """(Re)load the index if the file changed."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self._flags, self._identity = {}, None
+            return
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if identity == self._identity:
+            return
+        self._identity = identity
+        try:
+            with open(self.path, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Cannot read flag stats {self.path}: {e}")
+            self._flags = {}
+            return
+        if (index.get('version') != VERSION or index.get('metric') != self.metric
+                or tuple(map(tuple, index.get('palette', []))) != self.palette):
+            logger.info("Flag stats were built for other palette settings, ignoring them")
+            self._flags = {}
+            return
+        self._flags = index.get('flags', {})
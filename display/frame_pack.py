@@ -0,0 +1,229 @@
+"""
+Single-file pack of pre-rendered panel frames for every flag.
+The pack is memory-mapped, so a frame is handed to the SPI layer as a
+zero-copy memoryview instead of being read from one of ~250 small files.
+
+Layout (little endian):
+    header   magic, version, entry count, render settings key (or a digest
+             of it, if it does not fit the field)
+    index    one fixed-size record per flag: code, offset, length,
+             source PNG mtime/size and a blake2b hash of the frame
+    frames   the packed frames, back to back
+"""
+
+import os
+import mmap
+import struct
+import hashlib
+import logging
+import threading
+
+from .render_cache import RENDER_CACHE_DIR, source_stamp
+
+logger = logging.getLogger(__name__)
+
+PACK_FILE = os.path.join(RENDER_CACHE_DIR, "flags.pack")
+
+MAGIC = b"FLAGPACK"
+VERSION = 1
+# Bytes of the render settings key field
+SETTINGS_KEY_SIZE = 64
+# magic, version, entry count, render settings key
+HEADER = struct.Struct(f"<8sHI{SETTINGS_KEY_SIZE}s")
+# code, offset, length, source mtime_ns, source size, frame hash
+ENTRY = struct.Struct("<8sQIqQ16s")
+
+
+def stored_key(settings_key):
+    """
+    Return the form of a render settings key kept in the pack header.
+    Keys too long for the fixed-size field are replaced by a digest rather
+    than truncated, so two different settings never share a pack.
+    """
+    encoded = settings_key.encode()
+    if len(encoded) <= SETTINGS_KEY_SIZE:
+        return settings_key
+    return "blake2b:" + hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def frame_hash(frame):
+    """Return the 16-byte blake2b digest stored for each frame."""
+    return hashlib.blake2b(frame, digest_size=16).digest()
+
+
+def build_frame_pack(frames, settings_key, path=PACK_FILE):
+    """
+    Write a pack file, replacing any existing one atomically.
+
+    Args:
+        frames (iterable): (country code, packed frame, source path or None) tuples.
+        settings_key (str): Key from render_settings_key the frames were rendered with.
+        path (str, optional): Path of the pack file.
+
+    Returns:
+        int: Number of frames written.
+    """
+    frames = sorted(((code.lower(), frame, source) for code, frame, source in frames),
+                    key=lambda item: item[0])
+    offset = HEADER.size + ENTRY.size * len(frames)
+    index = []
+    for code, frame, source in frames:
+        if len(code.encode()) > 8:
+            raise ValueError(f"Country code {code!r} does not fit the pack index")
+        mtime_ns, size = source_stamp(source) or (0, 0)
+        index.append(ENTRY.pack(code.encode(), offset, len(frame), mtime_ns, size, frame_hash(frame)))
+        offset += len(frame)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(frames), stored_key(settings_key).encode()))
+        f.writelines(index)
+        for _, frame, _ in frames:
+            f.write(frame)
+    os.replace(tmp_path, path)
+    logger.info(f"Wrote {len(frames)} frames to {path}")
+    return len(frames)
+
+
+class FramePack:
+    """
+    Read-only view of a pack file. The file is re-mapped when it is
+    replaced by a rebuild, so a long-running server picks up new packs.
+    """
+
+    def __init__(self, path=PACK_FILE, verify=True):
+        """
+        Initialize the pack reader; the file is opened on first use.
+
+        Args:
+            path (str, optional): Path of the pack file.
+            verify (bool, optional): Check each frame against its stored hash.
+        """
+        self.path = path
+        self.verify = verify
+        # Settings key of the mapped pack, as returned by stored_key
+        self.settings_key = None
+        self._map = None
+        self._index = {}
+        self._identity = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, settings):
+        """
+        Create a pack reader from the ``display`` configuration section.
+
+        Args:
+            settings (dict): May contain ``frame_pack`` (False disables the pack).
+
+        Returns:
+            FramePack: The reader, or None if the pack is disabled.
+        """
+        settings = settings or {}
+        if not settings.get('frame_pack', True):
+            return None
+        return cls()
+
+    def get(self, code, settings_key, source=None):
+        """
+        Look up the frame of one flag.
+
+        Args:
+            code (str): Country code (cca2) of the flag.
+            settings_key (str): Key from render_settings_key for the current settings.
+            source (str, optional): Path of the image the frame would be rendered from.
+
+        Returns:
+            memoryview: Zero-copy view of the packed frame, or None if the pack has
+                no up-to-date frame for these settings and this source.
+        """
+        with self._lock:
+            if not self._refresh():
+                return None
+            if stored_key(settings_key) != self.settings_key:
+                logger.debug(f"Frame pack was built for {self.settings_key}, not {settings_key}")
+                return None
+            entry = self._index.get(code.lower())
+            if entry is None:
+                return None
+            offset, length, mtime_ns, size, digest = entry
+            if [mtime_ns, size] != (source_stamp(source) or [0, 0]):
+                logger.debug(f"Frame pack entry for {code} is stale")
+                return None
+            frame = memoryview(self._map)[offset:offset + length]
+            if self.verify and frame_hash(frame) != digest:
+                logger.warning(f"Frame pack entry for {code} is corrupt")
+                return None
+            return frame
+
+    def is_current(self, sources, settings_key):
+        """
+        Check whether the pack matches the flag images and display settings.
+
+        Args:
+            sources (dict): Source image path keyed by country code.
+            settings_key (str): Key from render_settings_key for the current settings.
+
+        Returns:
+            bool: False if the pack is missing or needs a rebuild.
+        """
+        with self._lock:
+            if not self._refresh() or stored_key(settings_key) != self.settings_key:
+                return False
+            stamps = {code.lower(): source_stamp(path) or [0, 0] for code, path in sources.items()}
+            if set(self._index) != set(stamps):
+                return False
+            return all([entry[2], entry[3]] == stamps[code] for code, entry in self._index.items())
+
+    def close(self):
+        """Unmap the pack file."""
+        with self._lock:
+            self._unmap()
+
+    def _refresh(self):
+        """Map the pack file, re-mapping it if it was replaced. Returns True if mapped."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self._unmap()
+            return False
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if identity == self._identity:
+            return self._map is not None
+        self._unmap()
+        self._identity = identity
+        pack = None
+        try:
+            with open(self.path, 'rb') as f:
+                pack = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, count, settings_key = HEADER.unpack_from(pack, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("not a frame pack or unsupported version")
+            index = {}
+            for i in range(count):
+                code, *entry = ENTRY.unpack_from(pack, HEADER.size + i * ENTRY.size)
+                if entry[0] + entry[1] > len(pack):
+                    raise ValueError(f"entry {i} extends past the end of the file")
+                index[code.rstrip(b'\0').decode()] = tuple(entry)
+        except (OSError, ValueError, struct.error) as e:
+            logger.error(f"Cannot read frame pack {self.path}: {e}")
+            if pack is not None:
+                pack.close()
+            return False
+        self._map = pack
+        self._index = index
+        self.settings_key = settings_key.rstrip(b'\0').decode()
+        logger.debug(f"Mapped frame pack with {count} frames for {self.settings_key}")
+        return True
+
+    def _unmap(self):
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # A frame view is still in use; the mapping is freed with it
+                pass
+        self._map = None
+        self._index = {}
+        self._identity = None
@@ -0,0 +1,138 @@
+"""
+Grid frames showing several flags at once (e.g. 2x2 or 3x2).
+Each flag is rendered into a packed tile of its own, which the render cache
+keeps per country and tile size. A grid frame is then put together by copying
+the packed tile rows into place, without resizing or dithering anything again.
+"""
+
+import logging
+
+from PIL import Image
+
+from .layout import compose, LAYOUT_LETTERBOX, BACKGROUND
+from .lazy_image import resolve_image
+
+logger = logging.getLogger(__name__)
+
+# Grid shapes selectable by name, as (columns, rows)
+GRID_SHAPES = {
+    '2x2': (2, 2),
+    '3x2': (3, 2),
+}
+DEFAULT_GRID_SHAPE = '2x2'
+
+# Packed byte of two white pixels of the 7-color panel, the default background
+WHITE = 0x11
+
+
+def parse_shape(shape):
+    """
+    Return (columns, rows) of a grid shape name.
+
+    Raises:
+        ValueError: If the shape is unknown.
+    """
+    if shape not in GRID_SHAPES:
+        raise ValueError(f"Unknown grid shape {shape!r}, expected one of {', '.join(GRID_SHAPES)}")
+    return GRID_SHAPES[shape]
+
+
+def grid_geometry(width, height, columns, rows, align=2):
+    """
+    Lay out the tiles of a grid on the frame.
+    Tile widths and x offsets are multiples of align, so every tile row starts
+    and ends on a byte boundary of the packed frame.
+
+    Args:
+        width (int): Frame width.
+        height (int): Frame height.
+        columns (int): Tiles per row.
+        rows (int): Tiles per column.
+        align (int, optional): Pixels per byte of the packed frame (a power of two).
+
+    Returns:
+        tuple: (tile width, tile height, list of (x, y) tile positions, row by row)
+    """
+    gap = max(align, height // 40) & -align
+    tile_width = ((width - gap * (columns + 1)) // columns) & -align
+    tile_height = (height - gap * (rows + 1)) // rows
+    # Center the grid; leftover pixels from the rounding go to the borders
+    left = ((width - columns * tile_width - (columns - 1) * gap) // 2) & -align
+    top = (height - rows * tile_height - (rows - 1) * gap) // 2
+    positions = [(left + column * (tile_width + gap), top + row * (tile_height + gap))
+                 for row in range(rows) for column in range(columns)]
+    return tile_width, tile_height, positions
+
+
+def render_tile(image, width, height, quantize, pack):
+    """
+    Render one flag into a packed tile.
+
+    Args:
+        image (PIL.Image): The flag image.
+        width (int): Tile width; a multiple of the pixels per packed byte.
+        height (int): Tile height.
+        quantize (callable): Quantizer mapping the image to palette indices.
+        pack (callable): Packs the palette indices, e.g. ``PanelProfile.pack``.
+
+    Returns:
+        bytes-like: The packed pixels, row by row.
+    """
+    return pack(quantize(compose(image, width, height, LAYOUT_LETTERBOX)))
+
+
+def assemble_grid(tiles, width, height, tile_width, tile_height, positions,
+                  bits_per_pixel=4, background=WHITE):
+    """
+    Copy packed tiles into a packed frame.
+
+    Args:
+        tiles (list): Packed tiles (bytes-like, or None for an empty cell), in the
+            order of positions.
+        width (int): Frame width.
+        height (int): Frame height.
+        tile_width (int): Tile width; a multiple of the pixels per packed byte.
+        tile_height (int): Tile height.
+        positions (list): (x, y) of each tile, with x on a byte boundary.
+        bits_per_pixel (int, optional): Bits per packed pixel.
+        background (int, optional): Packed byte of background pixels.
+
+    Returns:
+        bytearray: The packed frame.
+    """
+    per_byte = 8 // bits_per_pixel
+    frame = bytearray([background]) * (width * height // per_byte)
+    stride = width // per_byte
+    row_bytes = tile_width // per_byte
+    for tile, (x, y) in zip(tiles, positions):
+        if tile is None:
+            continue
+        tile = memoryview(bytes(tile))
+        offset = y * stride + x // per_byte
+        for row in range(tile_height):
+            frame[offset:offset + row_bytes] = tile[row * row_bytes:(row + 1) * row_bytes]
+            offset += stride
+    return frame
+
+
+def compose_grid(images, width, height, columns, rows, align=2):
+    """
+    Compose a grid as an RGB image, as the mock display previews it.
+
+    Args:
+        images (list): Flag images (PIL.Image or LazyImage), row by row.
+        width (int): Frame width.
+        height (int): Frame height.
+        columns (int): Tiles per row.
+        rows (int): Tiles per column.
+        align (int, optional): Pixels per byte of the panel's packed frame, so
+            the tiles line up with the ones prepare_grid packs.
+
+    Returns:
+        PIL.Image: The grid image.
+    """
+    tile_width, tile_height, positions = grid_geometry(width, height, columns, rows, align)
+    canvas = Image.new("RGB", (width, height), BACKGROUND)
+    for image, position in zip(images, positions):
+        canvas.paste(compose(resolve_image(image), tile_width, tile_height, LAYOUT_LETTERBOX), position)
+    return canvas
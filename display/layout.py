@@ -0,0 +1,250 @@
+"""
+Placement of a flag on the panel.
+``stretch`` scales the flag to the whole panel, ``letterbox`` keeps its
+aspect ratio on a white background, and ``card`` letterboxes it above a text
+panel with the country name, capital, population and region from
+countries.json. Fonts and rendered text panels are cached per process;
+whole composited frames are cached by the render cache and frame pack,
+whose keys include the layout.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+from .render_cache import BASE_DIR
+
+logger = logging.getLogger(__name__)
+
+COUNTRIES_FILE = os.path.join(BASE_DIR, "app", "static", "data", "countries.json")
+
+# Layouts selectable with the `layout` display setting
+LAYOUT_STRETCH = 'stretch'
+LAYOUT_LETTERBOX = 'letterbox'
+LAYOUT_CARD = 'card'
+LAYOUTS = (LAYOUT_STRETCH, LAYOUT_LETTERBOX, LAYOUT_CARD)
+DEFAULT_LAYOUT = LAYOUT_LETTERBOX
+# Part of render cache keys; bumped when composing changes what a layout
+# renders, so frames cached by older versions are not reused
+# (2: transparent flag pixels show the background)
+LAYOUT_REVISION = 2
+
+# Panel colors used for the background and the text
+BACKGROUND = (255, 255, 255)
+TEXT_COLOR = (0, 0, 0)
+
+# Share of the panel height taken by the text of the card layout
+TEXT_PANEL_RATIO = 0.28
+
+FONT_FILES = {
+    False: ("DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"),
+    True: ("DejaVuSans-Bold.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"),
+}
+
+# Country facts keyed by lower-case cca2, reloaded when countries.json changes
+_facts = {}
+_facts_digest = None
+_facts_identity = None
+_facts_lock = threading.Lock()
+
+
+def _load_facts():
+    """(Re)load the country facts if countries.json changed. Returns the data digest."""
+    global _facts, _facts_digest, _facts_identity
+    with _facts_lock:
+        try:
+            stat = os.stat(COUNTRIES_FILE)
+        except OSError:
+            _facts, _facts_digest, _facts_identity = {}, None, None
+            return None
+        identity = (stat.st_mtime_ns, stat.st_size)
+        if identity != _facts_identity:
+            with open(COUNTRIES_FILE, 'rb') as f:
+                raw = f.read()
+            facts = {}
+            for name, country in json.loads(raw).items():
+                code = country.get('cca2', '').lower()
+                if code:
+                    facts[code] = {
+                        'name': country.get('name', {}).get('common', name),
+                        'capital': ', '.join(country.get('capital') or []),
+                        'population': country.get('population'),
+                        'region': country.get('subregion') or country.get('region', ''),
+                    }
+            _facts = facts
+            _facts_digest = hashlib.blake2b(raw, digest_size=4).hexdigest()
+            _facts_identity = identity
+        return _facts_digest
+
+
+def country_facts(code):
+    """
+    Return what the card layout shows about a country.
+
+    Args:
+        code (str): Country code (cca2).
+
+    Returns:
+        dict: ``name``, ``capital``, ``population`` and ``region``, or None if unknown.
+    """
+    _load_facts()
+    return _facts.get(code.lower()) if code else None
+
+
+def layout_key(layout):
+    """
+    Return the layout part of render cache keys.
+    The card layout includes a digest of the country data, so cached frames
+    are re-rendered when the text they show changes.
+    """
+    if layout == LAYOUT_CARD:
+        return f"{layout}{LAYOUT_REVISION}-{_load_facts() or 'none'}"
+    return f"{layout}{LAYOUT_REVISION}"
+
+
+def format_population(population):
+    """Format a population count for display, e.g. ``5.4 million``."""
+    if not population:
+        return ''
+    if population >= 1_000_000_000:
+        return f"{population / 1_000_000_000:.2f} billion"
+    if population >= 1_000_000:
+        return f"{population / 1_000_000:.1f} million"
+    return f"{population:,}"
+
+
+@lru_cache(maxsize=16)
+def get_font(size, bold=False):
+    """Return a TrueType font of the given pixel size, falling back to Pillow's bundled font."""
+    for path in FONT_FILES[bold]:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+
+def _fit_font(draw, text, max_width, size, bold=False, min_size=12):
+    """Return the largest font up to size in which text fits max_width."""
+    while True:
+        font = get_font(size, bold)
+        if size <= min_size or draw.textlength(text, font=font) <= max_width:
+            return font
+        size -= 2
+
+
+@lru_cache(maxsize=32)
+def _text_panel(code, width, height, digest):
+    """
+    Render the text of the card layout.
+    The digest of the country data is part of the cache key only.
+
+    Returns:
+        PIL.Image: A ``1`` mode mask, set where text is drawn, or None.
+    """
+    facts = country_facts(code)
+    if not facts:
+        return None
+    lines = [(facts['name'], True, height * 2 // 5)]
+    details = [part for part in (facts['capital'], facts['region']) if part]
+    if details:
+        lines.append(('  ·  '.join(details), False, height // 5))
+    population = format_population(facts['population'])
+    if population:
+        lines.append((f"Population {population}", False, height // 5))
+
+    mask = Image.new("1", (width, height), 0)
+    draw = ImageDraw.Draw(mask)
+    # Unsmoothed glyphs stay solid black on the panel instead of dithering
+    draw.fontmode = "1"
+    fonts = [_fit_font(draw, text, width, size, bold) for text, bold, size in lines]
+    heights = [font.getbbox("Ag")[3] for font in fonts]
+    gap = max(0, (height - sum(heights)) // (len(lines) + 1))
+    y = gap
+    for (text, _, _), font, line_height in zip(lines, fonts, heights):
+        x = (width - draw.textlength(text, font=font)) // 2
+        draw.text((x, y), text, fill=1, font=font)
+        y += line_height + gap
+    return mask
+
+
+def flatten(image, background=BACKGROUND):
+    """
+    Convert an image to RGB, showing the background through transparent parts.
+    A plain ``convert("RGB")`` of a palette or RGBA flag would show whatever
+    color the transparent pixels happen to hold instead.
+
+    Args:
+        image (PIL.Image): The flag image, in any mode.
+        background (tuple, optional): RGB color behind the image.
+
+    Returns:
+        PIL.Image: A new RGB image.
+    """
+    if image.mode in ("RGBA", "LA", "PA") or 'transparency' in image.info:
+        image = image.convert("RGBA")
+        canvas = Image.new("RGBA", image.size, background + (255,))
+        return Image.alpha_composite(canvas, image).convert("RGB")
+    return image.convert("RGB")
+
+
+def flag_area(width, height, layout=LAYOUT_STRETCH):
+    """
+    Return the box a flag is fitted into on a frame of the given size.
+
+    Returns:
+        tuple: (left, top, right, bottom)
+    """
+    if layout == LAYOUT_CARD:
+        margin = height // 24
+        return margin, margin, width - margin, height - int(height * TEXT_PANEL_RATIO)
+    return 0, 0, width, height
+
+
+def _letterbox(image, canvas, box):
+    """Paste image into box of canvas at its own aspect ratio, centered."""
+    left, top, right, bottom = box
+    scale = min((right - left) / image.width, (bottom - top) / image.height)
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    if image.size != size:
+        image = image.resize(size, Image.Resampling.LANCZOS)
+    canvas.paste(image, (left + (right - left - size[0]) // 2, top + (bottom - top - size[1]) // 2))
+
+
+def compose(image, width, height, layout=LAYOUT_STRETCH, code=None):
+    """
+    Place an image on a panel-sized canvas.
+
+    Args:
+        image (PIL.Image): The flag image.
+        width (int): Frame width.
+        height (int): Frame height.
+        layout (str, optional): One of LAYOUTS.
+        code (str, optional): Country code (cca2); the card layout needs it for its text.
+
+    Returns:
+        PIL.Image: An RGB image of the frame size.
+    """
+    image = flatten(image)
+    if layout == LAYOUT_STRETCH or layout not in LAYOUTS:
+        if image.size != (width, height):
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+        return image
+
+    canvas = Image.new("RGB", (width, height), BACKGROUND)
+    text = None
+    if layout == LAYOUT_CARD and code:
+        left, top, right, bottom = flag_area(width, height, layout)
+        text = _text_panel(code.lower(), right - left, height - bottom - top, _load_facts())
+    if text is None:
+        _letterbox(image, canvas, (0, 0, width, height))
+        return canvas
+
+    _letterbox(image, canvas, (left, top, right, bottom))
+    canvas.paste(TEXT_COLOR, (left, bottom, right, height - top), text)
+    return canvas
@@ -0,0 +1,55 @@
+"""
+Images that are only loaded when a render stage needs their pixels.
+A frame found in the frame pack or render cache is validated against the
+source file alone, so an update that hits a cache, or never reaches a
+display, does not decode (or download) the flag at all.
+"""
+
+import threading
+
+
+class LazyImage:
+    """
+    Stands in for a PIL image until its pixels are needed.
+    ``filename`` is known up front; ``load()`` runs the loader once.
+    """
+
+    def __init__(self, loader, filename=None):
+        """
+        Initialize the lazy image.
+
+        Args:
+            loader (callable): Returns the PIL image when called.
+            filename (str, optional): Path of the file the image will be loaded
+                from, for cache validation.
+        """
+        self.filename = filename
+        self._loader = loader
+        self._image = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        """Whether the loader has run."""
+        return self._image is not None
+
+    def load(self):
+        """
+        Return the image, loading it on first use.
+
+        Returns:
+            PIL.Image: The loaded image.
+        """
+        with self._lock:
+            if self._image is None:
+                self._image = self._loader()
+                # The loader may have fallen back to another source
+                self.filename = getattr(self._image, 'filename', None) or self.filename
+            return self._image
+
+
+def resolve_image(image):
+    """Return the PIL image behind image, loading a LazyImage if needed."""
+    if isinstance(image, LazyImage):
+        return image.load()
+    return image
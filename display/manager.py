@@ -4,6 +4,7 @@ Provides a centralized interface for all display operations.
 """
 
 import os
+import copy
 import time
 import logging
 import threading
@@ -11,6 +12,9 @@ from PIL import Image
 
 from .lock import DisplayLock
 from .interfaces import DisplayInterface
+from .layout import DEFAULT_LAYOUT
+from .grid import DEFAULT_GRID_SHAPE, parse_shape, compose_grid
+from .panel_profiles import load_profile
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -18,6 +22,9 @@ logger = logging.getLogger(__name__)
 # Singleton instance
 _display_manager_instance = None
 
+# Seconds a warm session waits after an update before deep-sleeping the panel
+DEFAULT_SLEEP_DELAY = 60
+
 def get_display_manager(config=None):
     """
     Get the singleton instance of the DisplayManager.
@@ -54,6 +61,10 @@ class DisplayManager:
         self._display = None
         self._display_type = None
         self._lock = threading.Lock()
+        self._sleep_timer = None
+        self._render_pool = None
+        # The ``display`` section the e-paper driver was last configured with
+        self._display_settings = None
         
         # Try to initialize the display based on configuration
         self._initialize_display()
@@ -81,7 +92,8 @@ class DisplayManager:
             # Try to load the e-paper display interface
             try:
                 from .epaper import EPaperDisplay
-                self._display = EPaperDisplay()
+                self._display_settings = copy.deepcopy(self.config.get('display', {}))
+                self._display = EPaperDisplay(self._display_settings)
                 self._display_type = "epaper"
                 logger.info("E-Paper display initialized successfully")
                 return True
@@ -120,6 +132,16 @@ class DisplayManager:
                 
             # Initialize with new settings
             self._initialize_display()
+        elif self._display_type == "epaper" and self._display is not None:
+            # Pass hardware tuning changes on to the running driver. Reconfiguring
+            # remaps the frame pack and reopens the caches, so it is only done
+            # when the settings changed, and never while a frame is being sent
+            settings = self.config.get('display', {})
+            if settings != self._display_settings:
+                with self._lock:
+                    self._display.configure(settings)
+                    self._display_settings = copy.deepcopy(settings)
+                logger.debug("Display settings changed, driver reconfigured")
     
     def is_display_available(self):
         """
@@ -148,6 +170,15 @@ class DisplayManager:
         """
         return self._display_type == "mock"
     
+    def get_busy_durations(self):
+        """
+        Get how long each BUSY phase of the last e-paper update took.
+        
+        Returns:
+            dict: Seconds per phase, empty when no e-paper display is in use
+        """
+        return dict(getattr(self._display, 'busy_durations', None) or {})
+    
     def get_mock_display_image(self):
         """
         Get the current image from the mock display as base64 string.
@@ -165,13 +196,17 @@ class DisplayManager:
             logger.error(f"Error getting mock display image: {e}")
             return None
     
-    def display_image(self, image, force_update=False):
+    def display_image(self, image, force_update=False, force_refresh=False, cache_key=None):
         """
         Display an image on the physical display if available.
         
         Args:
             image (PIL.Image): The image to display.
             force_update (bool, optional): Force update even in headless mode. Defaults to False.
+            force_refresh (bool, optional): Refresh the panel even if it already shows
+                                            the same frame. Defaults to False.
+            cache_key (str, optional): Country code of the flag, used to look up and
+                                       store the packed frame in the render cache.
             
         Returns:
             bool: True if display was updated, False otherwise.
@@ -192,7 +227,9 @@ class DisplayManager:
                 return self._display.display_image(
                     image,
                     custom_width=custom_width,
-                    custom_height=custom_height
+                    custom_height=custom_height,
+                    layout=self.config.get('display', {}).get('layout', DEFAULT_LAYOUT),
+                    code=cache_key
                 )
             except Exception as e:
                 logger.error(f"Error updating mock display: {e}")
@@ -214,28 +251,187 @@ class DisplayManager:
         custom_width = self.config.get('display', {}).get('width')
         custom_height = self.config.get('display', {}).get('height')
         
+        # Start resizing and packing the frame right away: while this update
+        # waits for the locks or the panel resets, the frame is being prepared
+        frame = None
+        if hasattr(self._display, 'submit_frame'):
+            try:
+                frame = self._display.submit_frame(image, custom_width, custom_height, cache_key)
+            except Exception as e:
+                logger.error(f"Error preparing frame: {e}")
+                return False
+        
+        return self._show_frame(frame, force_refresh, image, custom_width, custom_height)
+
+    def display_grid(self, flags, shape=DEFAULT_GRID_SHAPE, force_update=False, force_refresh=False):
+        """
+        Display several flags at once in a grid.
+        
+        Args:
+            flags (list): (country code, PIL.Image) pairs, row by row; extra flags are ignored.
+            shape (str, optional): Grid shape, one of display.grid.GRID_SHAPES.
+            force_update (bool, optional): Force update even in headless mode. Defaults to False.
+            force_refresh (bool, optional): Refresh the panel even if it already shows
+                                            the same frame. Defaults to False.
+            
+        Returns:
+            bool: True if display was updated, False otherwise.
+        """
+        columns, rows = parse_shape(shape)
+        custom_width = self.config.get('display', {}).get('width')
+        custom_height = self.config.get('display', {}).get('height')
+
+        if self.use_mock:
+            if not self._display:
+                self._initialize_display()
+            if not self._display:
+                return False
+            try:
+                image = compose_grid([image for _, image in flags],
+                                     custom_width or self._display.width,
+                                     custom_height or self._display.height, columns, rows,
+                                     load_profile(self.config.get('display', {})).pixels_per_byte)
+                return self._display.display_image(image, custom_width=custom_width,
+                                                   custom_height=custom_height)
+            except Exception as e:
+                logger.error(f"Error updating mock display: {e}")
+                return False
+
+        if self.headless and not force_update:
+            logger.info("Skipping physical display update (headless mode)")
+            return False
+        if not self._display:
+            if not force_update or not self._initialize_display():
+                return False
+        if not hasattr(self._display, 'submit_grid'):
+            logger.error("Display does not support grid frames")
+            return False
+
+        try:
+            frame = self._display.submit_grid(flags, columns, rows, custom_width, custom_height)
+        except Exception as e:
+            logger.error(f"Error preparing grid frame: {e}")
+            return False
+        return self._show_frame(frame, force_refresh)
+
+    def _show_frame(self, frame, force_refresh=False, image=None, custom_width=None, custom_height=None):
+        """
+        Send a frame to the panel under the display locks.
+
+        Args:
+            frame: A Future from submit_frame or submit_grid, or None to have
+                the display render image itself.
+            force_refresh (bool, optional): Refresh even if the frame is unchanged.
+            image (PIL.Image, optional): The image, for displays without submit_frame.
+            custom_width (int, optional): Display width for image.
+            custom_height (int, optional): Display height for image.
+
+        Returns:
+            bool: True if display was updated, False otherwise.
+        """
         # Use a thread lock to prevent concurrent access from the same process
         with self._lock:
+            # A pending deferred sleep is superseded by this update
+            self._cancel_sleep()
+
             # Use a file lock to prevent concurrent access from different processes
             with DisplayLock() as lock:
                 if not lock.acquired:
                     logger.warning("Could not acquire display lock, skipping update")
+                    if frame is not None:
+                        frame.cancel()
                     return False
                 
                 try:
-                    result = self._display.display_image(
-                        image, 
-                        custom_width=custom_width,
-                        custom_height=custom_height
-                    )
-                    self._display.sleep()
+                    if frame is not None:
+                        result = self._display.display_frame(frame, force_refresh=force_refresh)
+                    else:
+                        result = self._display.display_image(
+                            image, 
+                            custom_width=custom_width,
+                            custom_height=custom_height
+                        )
+                    if not getattr(self._display, 'awake', True):
+                        # The refresh was skipped without touching the panel
+                        logger.debug("Panel was not woken, no sleep needed")
+                    elif self.config.get('display', {}).get('warm_session', False):
+                        # Return as soon as the refresh is done; sleep later
+                        self._schedule_sleep()
+                    else:
+                        self._display.sleep()
                     return result
                 except Exception as e:
                     logger.error(f"Error updating display: {e}")
                     return False
-    
+
+    def _schedule_sleep(self):
+        """Deep-sleep the panel after a quiet period instead of right away."""
+        self._cancel_sleep()
+        delay = self.config.get('display', {}).get('sleep_delay', DEFAULT_SLEEP_DELAY)
+        self._sleep_timer = threading.Timer(delay, self._deferred_sleep)
+        self._sleep_timer.daemon = True
+        self._sleep_timer.start()
+        logger.debug(f"Display sleep deferred by {delay}s")
+
+    def _cancel_sleep(self):
+        """Cancel a pending deferred sleep, if any."""
+        if self._sleep_timer is not None:
+            self._sleep_timer.cancel()
+            self._sleep_timer = None
+
+    def _deferred_sleep(self):
+        """Timer callback putting the panel into deep sleep."""
+        with self._lock:
+            # An update that started after this timer fired owns the panel now
+            if threading.current_thread() is not self._sleep_timer:
+                return
+            self._sleep_timer = None
+            if not self._display:
+                return
+
+            with DisplayLock() as lock:
+                if not lock.acquired:
+                    logger.warning("Could not acquire display lock, skipping deferred sleep")
+                    return
+                try:
+                    self._display.sleep()
+                except Exception as e:
+                    logger.error(f"Error putting display to sleep: {e}")
+
+    def start_render_pool(self):
+        """
+        Start the worker processes that render frames, and prewarm them.
+        Meant for the long-running server so rendering does not hold the GIL
+        on its request threads; one-shot scripts render in-process.
+        
+        Returns:
+            bool: True if frames will be rendered in worker processes.
+        """
+        settings = self.config.get('display', {})
+        workers = int(settings.get('render_workers', 1))
+        if workers <= 0 or self._display_type != "epaper" or self._display is None:
+            return False
+        if self._render_pool is None:
+            from .render_pool import RenderPool
+            profile = self._display.profile
+            self._render_pool = RenderPool(workers, slot_size=profile.frame_bytes)
+            try:
+                self._render_pool.start(self._display.dither, self._display.color_metric, profile)
+            except Exception as e:
+                logger.error(f"Could not start render workers, rendering in-process: {e}")
+                self._render_pool = None
+                return False
+        self._display.render_pool = self._render_pool
+        return True
+
     def close_display(self):
         """Close the display and free resources."""
+        self._cancel_sleep()
+        if self._render_pool is not None:
+            self._render_pool.shutdown()
+            self._render_pool = None
+            if self._display_type == "epaper" and self._display is not None:
+                self._display.render_pool = None
         if self._display:
             try:
                 self._display.close()
@@ -12,6 +12,8 @@ import base64
 from io import BytesIO
 
 from .interfaces import DisplayInterface
+from .layout import compose, LAYOUT_STRETCH
+from .lazy_image import resolve_image
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -39,7 +41,7 @@ class MockDisplay(DisplayInterface):
         self.initialized = True
         return True
         
-    def display_image(self, image, custom_width=None, custom_height=None):
+    def display_image(self, image, custom_width=None, custom_height=None, layout=LAYOUT_STRETCH, code=None):
         """
         Store the image for web preview display.
         
@@ -47,6 +49,8 @@ class MockDisplay(DisplayInterface):
             image (PIL.Image): The image to display. Will be resized to fit the display.
             custom_width (int, optional): Custom display width to override the default.
             custom_height (int, optional): Custom display height to override the default.
+            layout (str, optional): How the image is placed on the panel, see display.layout.
+            code (str, optional): Country code of the flag, for the text of the card layout.
             
         Returns:
             bool: True if successful, False otherwise
@@ -56,9 +60,8 @@ class MockDisplay(DisplayInterface):
             target_width = custom_width if custom_width is not None else self.width
             target_height = custom_height if custom_height is not None else self.height
                 
-            # Resize image if needed
-            if image.size != (target_width, target_height):
-                image = image.resize((target_width, target_height), Image.Resampling.LANCZOS)
+            # Lay the image out as the panel would
+            image = compose(resolve_image(image), target_width, target_height, layout, code)
             
             # Store the image in the global variable for web preview
             global current_display_image
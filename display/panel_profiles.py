@@ -0,0 +1,240 @@
+"""
+Panel profiles: what the render pipeline needs to know about an e-paper panel.
+A profile holds the resolution, the palette (with the code the controller
+expects for each color), the bits per pixel and how pixels are packed, and
+how the panel is mounted. Quantizers with
+their lookup tables and the constant clear frames are built once per
+profile, at startup, and shared by every frame rendered for it.
+
+The panel is selected with the ``panel`` display setting; the driver module
+of the same name in waveshare_epd/ talks to the hardware.
+"""
+
+import logging
+import threading
+
+from PIL import Image
+
+from waveshare_epd.framebuffer import EPD7IN3F_PALETTE, pack_pixels, clear_frame
+
+from .quantize import Quantizer, DITHER_MODES, DEFAULT_DITHER, DEFAULT_METRIC
+
+logger = logging.getLogger(__name__)
+
+# Mounting rotations in degrees, counter-clockwise from the panel's native orientation
+ROTATIONS = (0, 90, 180, 270)
+
+
+class PanelProfile:
+    """
+    Resolution, palette and buffer layout of one e-paper panel.
+    Frames are composed at ``width`` x ``height``, the size as mounted, and
+    rotated into the panel's native orientation when they are packed.
+    """
+
+    def __init__(self, name, width, height, palette, codes=None,
+                 bits_per_pixel=4, rotation=0, white=1, driver=None):
+        """
+        Initialize a profile.
+
+        Args:
+            name (str): Profile name, as used for the ``panel`` setting.
+            width (int): Native width of the panel in pixels.
+            height (int): Native height of the panel in pixels.
+            palette (sequence): The colors the panel is driven with, as (r, g, b) tuples.
+            codes (sequence, optional): The controller's pixel code of each palette
+                color; defaults to the palette index.
+            bits_per_pixel (int, optional): 1, 2, 4 or 8; the first pixel of a byte
+                goes into its most significant bits.
+            rotation (int, optional): Mounting rotation, one of ROTATIONS.
+            white (int, optional): Palette index of white, used for clear frames.
+            driver (str, optional): Name of the driver module in waveshare_epd;
+                defaults to the profile name.
+
+        Raises:
+            ValueError: If the packing or rotation is not supported.
+        """
+        if bits_per_pixel not in (1, 2, 4, 8):
+            raise ValueError(f"Unsupported bits per pixel: {bits_per_pixel}")
+        if rotation not in ROTATIONS:
+            raise ValueError(f"Unsupported rotation {rotation!r}, expected one of {ROTATIONS}")
+        self.name = name
+        self.native_width = width
+        self.native_height = height
+        self.palette = tuple(map(tuple, palette))
+        self.codes = tuple(codes) if codes else tuple(range(len(self.palette)))
+        if len(self.codes) != len(self.palette) or max(self.codes) >= 1 << bits_per_pixel:
+            raise ValueError(f"Pixel codes of panel {name} do not fit its palette and packing")
+        self.bits_per_pixel = bits_per_pixel
+        self.rotation = rotation
+        self.white = white
+        self.driver = driver or name
+        if rotation in (90, 270):
+            self.width, self.height = height, width
+        else:
+            self.width, self.height = width, height
+        # Palette index -> pixel code, or None where they are the same
+        self._code_table = None
+        if self.codes != tuple(range(len(self.codes))):
+            self._code_table = bytes(self.codes) + bytes(256 - len(self.codes))
+        self._quantizers = {}
+        self._lock = threading.Lock()
+
+    def rotated(self, rotation):
+        """Return this profile mounted at another rotation."""
+        if rotation == self.rotation:
+            return self
+        return PanelProfile(self.name, self.native_width, self.native_height, self.palette,
+                            self.codes, self.bits_per_pixel, rotation, self.white, self.driver)
+
+    @property
+    def pixels_per_byte(self):
+        """Number of pixels packed into each byte."""
+        return 8 // self.bits_per_pixel
+
+    @property
+    def frame_bytes(self):
+        """Size of a packed frame in bytes."""
+        return self.native_width * self.native_height * self.bits_per_pixel // 8
+
+    def quantizer(self, dither=DEFAULT_DITHER, metric=DEFAULT_METRIC):
+        """Return the Quantizer of a dither mode and color metric, created on first use."""
+        key = (dither, metric)
+        quantizer = self._quantizers.get(key)
+        if quantizer is None:
+            with self._lock:
+                quantizer = self._quantizers.get(key)
+                if quantizer is None:
+                    quantizer = self._quantizers[key] = Quantizer(self.palette, dither, metric)
+        return quantizer
+
+    def clear_buffer(self, index=None):
+        """
+        Return the constant frame filling the panel with one color.
+
+        Args:
+            index (int, optional): Palette index of the color; defaults to white.
+
+        Returns:
+            bytes: The packed frame, shared by all calls and with the driver's Clear.
+        """
+        index = self.white if index is None else index
+        return clear_frame(self.codes[index], self.bits_per_pixel,
+                           self.native_width * self.native_height)
+
+    def prepare(self, dithers=None, metric=DEFAULT_METRIC):
+        """
+        Build the quantizers, lookup tables and clear frame ahead of the first frame.
+
+        Args:
+            dithers (sequence, optional): Dither modes to prepare; defaults to all.
+            metric (str, optional): Color metric of the lookup tables.
+        """
+        sample = Image.new("RGB", (8, 8))
+        for dither in dithers or DITHER_MODES:
+            self.quantizer(dither, metric)(sample)
+        self.clear_buffer()
+        logger.debug(f"Prepared render tables of panel {self.name}")
+
+    def pack(self, indices):
+        """
+        Pack one palette index per byte into a frame buffer for the panel.
+
+        Args:
+            indices (bytes-like): Palette indices in native pixel order.
+
+        Returns:
+            bytearray: The packed frame.
+        """
+        if self._code_table is not None:
+            indices = bytes(indices).translate(self._code_table)
+        return pack_pixels(indices, self.bits_per_pixel)
+
+    def render(self, image, quantize=None):
+        """
+        Quantize and pack an image of the profile's size into a frame buffer.
+
+        Args:
+            image (PIL.Image): The composed frame, ``width`` x ``height``.
+            quantize (callable, optional): Quantizer mapping the image to palette
+                indices; defaults to the profile's quantizer for DEFAULT_DITHER.
+
+        Returns:
+            bytearray: The packed frame.
+
+        Raises:
+            ValueError: If the image does not have the profile's size.
+        """
+        if image.size != (self.width, self.height):
+            raise ValueError(f"Frame is {image.width}x{image.height}, "
+                             f"panel {self.name} expects {self.width}x{self.height}")
+        if self.rotation:
+            image = image.rotate(self.rotation, expand=True)
+        quantize = quantize or self.quantizer()
+        return self.pack(quantize(image.convert("RGB")))
+
+
+PROFILES = {profile.name: profile for profile in (
+    # 7.3" 7-color ACeP panel, the one this project is built around
+    PanelProfile('epd7in3f', 800, 480, palette=EPD7IN3F_PALETTE, bits_per_pixel=4),
+    # 7.3" 4-color panel (black, white, yellow, red), four pixels per byte
+    PanelProfile(
+        'epd7in3g', 800, 480,
+        palette=((0, 0, 0), (255, 255, 255), (255, 255, 0), (255, 0, 0)),
+        bits_per_pixel=2),
+    # 13.3" 6-color Spectra panel; its controller skips pixel code 4
+    PanelProfile(
+        'epd13in3e', 1200, 1600,
+        palette=((0, 0, 0), (255, 255, 255), (255, 255, 0), (255, 0, 0),
+                 (0, 0, 255), (0, 255, 0)),
+        codes=(0, 1, 2, 3, 5, 6),
+        bits_per_pixel=4),
+)}
+DEFAULT_PANEL = 'epd7in3f'
+
+# Profiles by (name, rotation), so every user shares one set of tables
+_profiles = {}
+_profiles_lock = threading.Lock()
+
+
+def get_profile(name=DEFAULT_PANEL, rotation=0):
+    """
+    Return the shared profile of a panel.
+
+    Args:
+        name (str, optional): One of PROFILES.
+        rotation (int, optional): Mounting rotation, one of ROTATIONS.
+
+    Raises:
+        ValueError: If the panel or rotation is unknown.
+    """
+    if name not in PROFILES:
+        raise ValueError(f"Unknown panel {name!r}, expected one of {', '.join(PROFILES)}")
+    with _profiles_lock:
+        profile = _profiles.get((name, rotation))
+        if profile is None:
+            profile = _profiles[(name, rotation)] = PROFILES[name].rotated(rotation)
+        return profile
+
+
+def load_profile(settings):
+    """
+    Return the profile selected in the ``display`` configuration section.
+
+    Args:
+        settings (dict): May contain ``panel`` (one of PROFILES) and ``rotation``
+            (one of ROTATIONS).
+
+    Returns:
+        PanelProfile: The profile; the default panel if the settings are invalid.
+    """
+    settings = settings or {}
+    name = settings.get('panel', DEFAULT_PANEL)
+    if name not in PROFILES:
+        logger.warning(f"Unknown panel {name!r}, using {DEFAULT_PANEL}")
+        name = DEFAULT_PANEL
+    rotation = settings.get('rotation', 0)
+    if rotation not in ROTATIONS:
+        logger.warning(f"Unsupported rotation {rotation!r}, using 0")
+        rotation = 0
+    return get_profile(name, rotation)
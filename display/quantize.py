@@ -0,0 +1,301 @@
+"""
+Quantization of RGB images to the e-paper panel palette.
+Nearest-color and ordered (Bayer) dithering look every pixel up in a
+precomputed RGB -> palette index table, so a whole frame is mapped with one
+vectorized lookup. By default the table is built with perceptual
+(CIEDE2000) distances to the panel colors, stored on disk and memory-mapped
+on later runs. Error diffusion uses Pillow's Floyd-Steinberg
+implementation.
+"""
+
+import os
+import mmap
+import hashlib
+import logging
+
+from PIL import Image
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from waveshare_epd.framebuffer import palette_image
+
+logger = logging.getLogger(__name__)
+
+# Base directory of this project (~/Flags)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LUT_DIR = os.path.join(BASE_DIR, "render_cache")
+
+# Dithering modes selectable with the `dither` display setting
+DITHER_NONE = 'none'
+DITHER_ORDERED = 'ordered'
+DITHER_FLOYD_STEINBERG = 'floyd-steinberg'
+DITHER_MODES = (DITHER_NONE, DITHER_ORDERED, DITHER_FLOYD_STEINBERG)
+DEFAULT_DITHER = DITHER_FLOYD_STEINBERG
+# Setting that picks one of DITHER_MODES per flag, see display.flag_stats
+DITHER_AUTO = 'auto'
+
+# Color distances selectable with the `color_metric` display setting
+METRIC_RGB = 'rgb'
+METRIC_LAB = 'lab'
+COLOR_METRICS = (METRIC_RGB, METRIC_LAB)
+DEFAULT_METRIC = METRIC_LAB
+# Revision of each metric's distance function; part of lookup table and render
+# cache keys, so tables and frames built with an older revision are not reused
+METRIC_REVISIONS = {METRIC_RGB: 1, METRIC_LAB: 2}
+
+# Weighting factors (k_L, k_C) of the ``lab`` distance (CIEDE2000). The panel
+# shows its colors much darker and duller than the sRGB colors it is driven
+# with, so lightness counts less and chroma more than in plain CIEDE2000:
+# dark and light blues stay blue and flag reds stay red.
+LAB_LIGHTNESS_WEIGHT = 2.0
+LAB_CHROMA_WEIGHT = 0.6
+
+# Bits kept per channel when indexing the lookup table (64x64x64 bins)
+LUT_BITS = 6
+
+# 4x4 Bayer threshold matrix, and how far (in 0-255 levels) it moves a pixel.
+# Small enough that exact palette colors, as on most flags, stay solid.
+BAYER_4X4 = (
+    (0, 8, 2, 10),
+    (12, 4, 14, 6),
+    (3, 11, 1, 9),
+    (15, 7, 13, 5),
+)
+ORDERED_SPREAD = 64
+
+# Lookup tables, keyed by (palette, bits, metric)
+_luts = {}
+
+# D65 reference white for the XYZ -> Lab conversion
+_WHITE_D65 = (0.95047, 1.0, 1.08883)
+_RGB_TO_XYZ = (
+    (0.4124564, 0.3575761, 0.1804375),
+    (0.2126729, 0.7151522, 0.0721750),
+    (0.0193339, 0.1191920, 0.9503041),
+)
+
+
+def srgb_to_lab(rgb):
+    """
+    Convert sRGB colors to CIELAB.
+
+    Args:
+        rgb (numpy.ndarray): Colors with 0-255 channels in the last axis.
+
+    Returns:
+        numpy.ndarray: L*, a*, b* in the last axis, as float64.
+    """
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    linear = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = (linear @ np.array(_RGB_TO_XYZ).T) / np.array(_WHITE_D65)
+    f = np.where(xyz > 216 / 24389, np.cbrt(xyz), (24389 / 27 * xyz + 16) / 116)
+    return np.stack((116 * f[..., 1] - 16,
+                     500 * (f[..., 0] - f[..., 1]),
+                     200 * (f[..., 1] - f[..., 2])), axis=-1)
+
+
+def metric_key(metric):
+    """Return the name of a color metric as used in cache keys, with its revision."""
+    revision = METRIC_REVISIONS.get(metric, 1)
+    return metric if revision == 1 else f"{metric}{revision}"
+
+
+def ciede2000(lab1, lab2, k_l=1.0, k_c=1.0):
+    """
+    Compute CIEDE2000 color differences.
+
+    Args:
+        lab1 (numpy.ndarray): CIELAB colors in the last axis.
+        lab2 (numpy.ndarray): CIELAB colors, broadcastable against lab1.
+        k_l (float, optional): Lightness weighting factor; larger values make
+            lightness differences count less.
+        k_c (float, optional): Chroma weighting factor, likewise.
+
+    Returns:
+        numpy.ndarray: The differences, in the broadcast shape without the last axis.
+    """
+    l1, a1, b1 = np.moveaxis(np.asarray(lab1, dtype=np.float64), -1, 0)
+    l2, a2, b2 = np.moveaxis(np.asarray(lab2, dtype=np.float64), -1, 0)
+    c_mean = (np.hypot(a1, b1) + np.hypot(a2, b2)) / 2
+    g = 0.5 * (1 - np.sqrt(c_mean ** 7 / (c_mean ** 7 + 25.0 ** 7)))
+    a1, a2 = a1 * (1 + g), a2 * (1 + g)
+    c1, c2 = np.hypot(a1, b1), np.hypot(a2, b2)
+    h1 = np.degrees(np.arctan2(b1, a1)) % 360
+    h2 = np.degrees(np.arctan2(b2, a2)) % 360
+    chromatic = c1 * c2 != 0
+
+    dh = h2 - h1
+    dh = np.where(dh > 180, dh - 360, np.where(dh < -180, dh + 360, dh))
+    dh = np.where(chromatic, dh, 0)
+    delta_l = l2 - l1
+    delta_c = c2 - c1
+    delta_h = 2 * np.sqrt(c1 * c2) * np.sin(np.radians(dh) / 2)
+
+    l_mean = (l1 + l2) / 2
+    c_mean = (c1 + c2) / 2
+    h_sum = h1 + h2
+    h_mean = np.where(np.abs(h1 - h2) > 180, (h_sum + 360) / 2, h_sum / 2) % 360
+    h_mean = np.where(chromatic, h_mean, h_sum)
+    t = (1 - 0.17 * np.cos(np.radians(h_mean - 30)) + 0.24 * np.cos(np.radians(2 * h_mean))
+         + 0.32 * np.cos(np.radians(3 * h_mean + 6)) - 0.20 * np.cos(np.radians(4 * h_mean - 63)))
+    s_l = 1 + 0.015 * (l_mean - 50) ** 2 / np.sqrt(20 + (l_mean - 50) ** 2)
+    s_c = 1 + 0.045 * c_mean
+    s_h = 1 + 0.015 * c_mean * t
+    r_t = (-2 * np.sqrt(c_mean ** 7 / (c_mean ** 7 + 25.0 ** 7))
+           * np.sin(np.radians(60 * np.exp(-((h_mean - 275) / 25) ** 2))))
+
+    term_l = delta_l / (k_l * s_l)
+    term_c = delta_c / (k_c * s_c)
+    term_h = delta_h / s_h
+    return np.sqrt(term_l ** 2 + term_c ** 2 + term_h ** 2 + r_t * term_c * term_h)
+
+
+def build_lut(palette, bits=LUT_BITS, metric=DEFAULT_METRIC):
+    """
+    Build the table mapping each RGB bin to its nearest palette color.
+
+    Args:
+        palette (sequence): The panel colors as (r, g, b) tuples.
+        bits (int, optional): Bits kept per channel.
+        metric (str, optional): ``lab`` for perceptual (CIEDE2000, weighted by
+            LAB_LIGHTNESS_WEIGHT and LAB_CHROMA_WEIGHT) distance, ``rgb`` for
+            plain RGB distance.
+
+    Returns:
+        numpy.ndarray: uint8 palette indices of shape (2**bits,) * 3.
+    """
+    levels = 1 << bits
+    step = 256 // levels
+    centers = np.arange(levels) * step + step // 2
+    bins = np.stack(np.meshgrid(centers, centers, centers, indexing='ij'), axis=-1)
+    colors = np.array(palette, dtype=np.float64)
+    if metric == METRIC_LAB:
+        bins = srgb_to_lab(bins)
+        colors = srgb_to_lab(colors)
+    # Compare one palette color at a time to keep memory use low on the Pi
+    best = np.zeros(bins.shape[:3], dtype=np.uint8)
+    best_distance = np.full(bins.shape[:3], np.inf)
+    for index, color in enumerate(colors):
+        if metric == METRIC_LAB:
+            distance = ciede2000(bins, color, LAB_LIGHTNESS_WEIGHT, LAB_CHROMA_WEIGHT)
+        else:
+            distance = ((bins - color) ** 2).sum(axis=-1)
+        closer = distance < best_distance
+        best[closer] = index
+        best_distance[closer] = distance[closer]
+    return best
+
+
+def lut_path(palette, bits=LUT_BITS, metric=DEFAULT_METRIC, lut_dir=LUT_DIR):
+    """Return the file the lookup table of these settings is stored in."""
+    palette_hash = hashlib.blake2b(repr(tuple(map(tuple, palette))).encode(),
+                                   digest_size=4).hexdigest()
+    return os.path.join(lut_dir, f"lut-{palette_hash}-{metric_key(metric)}-{bits}.bin")
+
+
+def _load_lut(path, bits):
+    """Memory-map a stored lookup table, or return None if it is missing or invalid."""
+    try:
+        with open(path, 'rb') as f:
+            table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(table) != 1 << (3 * bits):
+        logger.warning(f"Ignoring lookup table {path} of unexpected size")
+        table.close()
+        return None
+    return np.frombuffer(table, dtype=np.uint8).reshape((1 << bits,) * 3)
+
+
+def _save_lut(path, lut):
+    """Store a lookup table, replacing the file atomically."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(lut.tobytes())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.error(f"Error saving lookup table {path}: {e}")
+
+
+def get_lut(palette, bits=LUT_BITS, metric=DEFAULT_METRIC):
+    """
+    Return the lookup table of a palette.
+    It is memory-mapped from disk if it was stored before, otherwise built
+    (about a second on a Pi for the Lab metric) and stored.
+    """
+    key = (tuple(map(tuple, palette)), bits, metric)
+    lut = _luts.get(key)
+    if lut is None:
+        path = lut_path(palette, bits, metric)
+        lut = _load_lut(path, bits)
+        if lut is None:
+            logger.info(f"Building {metric} palette lookup table")
+            lut = build_lut(palette, bits, metric)
+            _save_lut(path, lut)
+        _luts[key] = lut
+    return lut
+
+
+class Quantizer:
+    """
+    Maps RGB images to one palette index per pixel with the selected dithering.
+    Instances are callables suitable for ``EPD.getbuffer(image, quantize=...)``.
+    """
+
+    def __init__(self, palette, mode=DEFAULT_DITHER, metric=DEFAULT_METRIC):
+        """
+        Initialize the quantizer.
+
+        Args:
+            palette (sequence): The panel colors as (r, g, b) tuples.
+            mode (str, optional): One of DITHER_MODES.
+            metric (str, optional): One of COLOR_METRICS, used by the lookup table.
+
+        Raises:
+            ValueError: If the mode or metric is unknown.
+        """
+        if mode not in DITHER_MODES:
+            raise ValueError(f"Unknown dither mode {mode!r}, expected one of {', '.join(DITHER_MODES)}")
+        if metric not in COLOR_METRICS:
+            raise ValueError(f"Unknown color metric {metric!r}, expected one of {', '.join(COLOR_METRICS)}")
+        if np is None and mode == DITHER_ORDERED:
+            logger.warning("Ordered dithering needs NumPy, falling back to nearest color")
+            mode = DITHER_NONE
+        self.palette = tuple(map(tuple, palette))
+        self.mode = mode
+        self.metric = metric
+        self._palette_image = palette_image(self.palette)
+
+    def __call__(self, image):
+        """
+        Quantize an image.
+
+        Args:
+            image (PIL.Image): The image to quantize.
+
+        Returns:
+            bytes-like: One palette index per pixel, row by row.
+        """
+        image = image.convert("RGB")
+        if self.mode == DITHER_FLOYD_STEINBERG:
+            return image.quantize(palette=self._palette_image,
+                                  dither=Image.Dither.FLOYDSTEINBERG).tobytes('raw')
+        if np is None:
+            return image.quantize(palette=self._palette_image,
+                                  dither=Image.Dither.NONE).tobytes('raw')
+
+        shift = 8 - LUT_BITS
+        pixels = np.asarray(image)
+        if self.mode == DITHER_ORDERED:
+            height, width = pixels.shape[:2]
+            thresholds = (np.array(BAYER_4X4, dtype=np.int16) * 2 - 15) * ORDERED_SPREAD // 32
+            offsets = np.tile(thresholds, (height // 4 + 1, width // 4 + 1))[:height, :width]
+            pixels = np.clip(pixels + offsets[..., None], 0, 255).astype(np.uint8)
+        pixels = pixels >> shift
+        lut = get_lut(self.palette, metric=self.metric)
+        return lut[pixels[..., 0], pixels[..., 1], pixels[..., 2]].tobytes()
@@ -0,0 +1,316 @@
+"""
+Refresh policy for the e-paper display.
+Decides when a full clearing refresh is needed to remove ghosting, so normal
+updates can go straight to a single refresh of the new frame, and when an
+update can be skipped because the panel already shows the same frame.
+The frame on the panel is kept run-length compressed next to the state file,
+so the changed-pixel ratio is measured across processes (e.g. cron runs) too.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .rle import RleFrame, frame_chunks
+
+logger = logging.getLogger(__name__)
+
+# Base directory of this project (~/Flags)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATE_FILE = os.path.join(BASE_DIR, ".panel_state.json")
+
+# Defaults for the `display` config keys of the same name
+DEFAULT_CLEAR_EVERY = 50
+DEFAULT_GHOSTING_THRESHOLD = 20.0
+
+
+def _changed_pixel_table(bits_per_pixel):
+    """Lookup table of the number of non-zero pixels in each byte of an XOR-ed frame pair."""
+    mask = (1 << bits_per_pixel) - 1
+    return bytes(sum((i >> shift) & mask != 0 for shift in range(0, 8, bits_per_pixel))
+                 for i in range(256))
+
+
+# Tables by bits per pixel
+_CHANGED_PIXELS = {bits: _changed_pixel_table(bits) for bits in (1, 2, 4, 8)}
+
+
+def _changed_pixels(previous, current, bits_per_pixel=4):
+    """Count the pixels that differ between two equally long pieces of packed frame."""
+    table = _CHANGED_PIXELS[bits_per_pixel]
+    if np is not None:
+        diff = np.frombuffer(previous, dtype=np.uint8) ^ np.frombuffer(current, dtype=np.uint8)
+        return int(np.frombuffer(table, dtype=np.uint8)[diff].sum(dtype=np.int64))
+    size = len(current)
+    diff = (int.from_bytes(previous, 'big') ^ int.from_bytes(current, 'big')).to_bytes(size, 'big')
+    return sum(diff.translate(table))
+
+
+def changed_pixel_ratio(previous, current, bits_per_pixel=4):
+    """
+    Compute the fraction of pixels that differ between two packed frames.
+    Compressed frames are compared piece by piece without decoding them fully.
+
+    Args:
+        previous (bytes-like or RleFrame): The frame currently on the panel, or None if unknown.
+        current (bytes-like or RleFrame): The frame about to be displayed.
+        bits_per_pixel (int, optional): Packing of the frames: 1, 2, 4 or 8.
+
+    Returns:
+        float: Between 0.0 (identical) and 1.0; 1.0 if the previous frame is unknown.
+    """
+    if previous is None or len(previous) != len(current) or not len(current):
+        return 1.0
+    changed = sum(_changed_pixels(old, new, bits_per_pixel)
+                  for old, new in zip(frame_chunks(previous), frame_chunks(current)))
+    return changed / float(8 // bits_per_pixel * len(current))
+
+
+def frame_fingerprint(frame):
+    """
+    Compute a short fingerprint of a packed frame buffer.
+    A compressed frame gets the same fingerprint as its raw contents.
+
+    Returns:
+        str: Hex digest identifying the frame contents.
+    """
+    if isinstance(frame, RleFrame):
+        digest = hashlib.blake2b(digest_size=16)
+        for chunk in frame.chunks():
+            digest.update(chunk)
+        return digest.hexdigest()
+    return hashlib.blake2b(frame, digest_size=16).hexdigest()
+
+
+def _keep(frame):
+    """Return a copy of a frame that stays valid after the caller reuses its buffer."""
+    return frame if isinstance(frame, RleFrame) else bytes(frame)
+
+
+def panel_frame_file(panel, state_file=STATE_FILE):
+    """Return the file the frame last sent to a panel is kept in."""
+    return f"{os.path.splitext(state_file)[0]}-{panel}.rle"
+
+
+def load_panel_frame(path):
+    """
+    Load a persisted panel frame.
+
+    Returns:
+        RleFrame or None: The frame, or None if it is missing or invalid.
+    """
+    try:
+        with open(path, 'rb') as f:
+            return RleFrame(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def save_panel_frame(path, frame):
+    """Persist a panel frame run-length compressed, replacing the file atomically."""
+    try:
+        if not isinstance(frame, RleFrame):
+            frame = RleFrame.from_frame(frame)
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(frame.data)
+        os.replace(tmp_file, path)
+    except Exception as e:
+        logger.error(f"Error saving panel frame: {e}")
+
+
+def load_panel_state(panel, state_file=STATE_FILE):
+    """
+    Load the persisted state record of one panel.
+
+    Returns:
+        dict: The panel's state, empty if none was saved yet.
+    """
+    try:
+        with open(state_file, 'r') as f:
+            return json.load(f).get(panel, {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_panel_state(panel, state, state_file=STATE_FILE):
+    """Persist the state record of one panel, replacing the file atomically."""
+    try:
+        try:
+            with open(state_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        data[panel] = state
+        tmp_file = f"{state_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_file, state_file)
+    except Exception as e:
+        logger.error(f"Error saving panel state: {e}")
+
+
+class RefreshPolicy:
+    """
+    Tracks refreshes and changed pixels since the last clearing refresh of a panel
+    and asks for a clear only once a ghosting threshold is reached.
+    """
+
+    def __init__(self, panel="epd7in3f", clear_every=DEFAULT_CLEAR_EVERY,
+                 ghosting_threshold=DEFAULT_GHOSTING_THRESHOLD, state_file=STATE_FILE,
+                 bits_per_pixel=4):
+        """
+        Initialize the refresh policy.
+
+        Args:
+            panel (str, optional): Key of the panel in the state file.
+            clear_every (int, optional): Clear after this many refreshes; 0 disables.
+            ghosting_threshold (float, optional): Clear once the changed-pixel ratios
+                summed since the last clear reach this value; 0 disables.
+            state_file (str, optional): Path of the JSON state file.
+            bits_per_pixel (int, optional): Packing of the panel's frames.
+        """
+        self.panel = panel
+        self.bits_per_pixel = bits_per_pixel
+        self.clear_every = clear_every
+        self.ghosting_threshold = ghosting_threshold
+        self.state_file = state_file
+        self.frame_file = panel_frame_file(panel, state_file)
+        # The frame last sent to the panel and its fingerprint, once known
+        self._last_frame = None
+        self._last_frame_hash = None
+        self.state = {
+            'refreshes_since_clear': 0,
+            'changed_since_clear': 0.0,
+            'total_refreshes': 0,
+            'last_clear': None,
+            'last_frame_hash': None,
+        }
+        self.state.update(load_panel_state(panel, state_file))
+
+    @classmethod
+    def from_config(cls, settings, panel="epd7in3f", bits_per_pixel=4):
+        """
+        Create a policy from the ``display`` configuration section.
+        The simulated backend keeps its state apart from the real panel's, so
+        a benchmark run never makes the panel skip a frame it does not show.
+
+        Args:
+            settings (dict): May contain ``clear_every``, ``ghosting_threshold``
+                and ``backend``.
+            panel (str, optional): Name of the panel.
+            bits_per_pixel (int, optional): Packing of the panel's frames.
+        """
+        settings = settings or {}
+        if (settings.get('backend') == 'simulated'
+                or os.environ.get('EPD_BACKEND', '').lower() == 'simulated'):
+            panel = f"{panel}-simulated"
+        return cls(panel=panel,
+                   clear_every=int(settings.get('clear_every', DEFAULT_CLEAR_EVERY)),
+                   ghosting_threshold=float(settings.get('ghosting_threshold', DEFAULT_GHOSTING_THRESHOLD)),
+                   bits_per_pixel=bits_per_pixel)
+
+    def configure(self, settings):
+        """Apply new thresholds from the ``display`` configuration section."""
+        settings = settings or {}
+        self.clear_every = int(settings.get('clear_every', self.clear_every))
+        self.ghosting_threshold = float(settings.get('ghosting_threshold', self.ghosting_threshold))
+
+    def needs_clear(self):
+        """
+        Check whether the next update should be preceded by a clearing refresh.
+
+        Returns:
+            bool: True once a ghosting threshold has been reached.
+        """
+        if self.clear_every and self.state['refreshes_since_clear'] >= self.clear_every:
+            return True
+        if self.ghosting_threshold and self.state['changed_since_clear'] >= self.ghosting_threshold:
+            return True
+        return False
+
+    def is_unchanged(self, frame):
+        """
+        Check whether the panel already shows this exact frame.
+        The persisted fingerprint is re-read first, since another process
+        (e.g. the cron script) may have updated the panel in the meantime.
+
+        Args:
+            frame (bytes-like): The frame about to be displayed.
+
+        Returns:
+            bool: True if the frame matches the last one sent to the panel.
+        """
+        self.state.update(load_panel_state(self.panel, self.state_file))
+        return self.state.get('last_frame_hash') == frame_fingerprint(frame)
+
+    def record_clear(self, frame=None):
+        """
+        Record a clearing refresh.
+
+        Args:
+            frame (bytes-like, optional): The uniform frame the panel was cleared to.
+        """
+        self.state['refreshes_since_clear'] = 0
+        self.state['changed_since_clear'] = 0.0
+        self.state['last_clear'] = time.strftime("%Y-%m-%d %H:%M:%S")
+        self._remember(frame)
+        self._save()
+
+    def record_refresh(self, frame):
+        """
+        Record a refresh showing the given packed frame.
+
+        Args:
+            frame (bytes-like or RleFrame): The frame sent to the panel.
+        """
+        ratio = changed_pixel_ratio(self._previous_frame(), frame, self.bits_per_pixel)
+        self.state['refreshes_since_clear'] += 1
+        self.state['changed_since_clear'] += ratio
+        self.state['total_refreshes'] += 1
+        self._remember(frame)
+        logger.debug(f"Refresh changed {ratio:.1%} of pixels; "
+                     f"{self.state['refreshes_since_clear']} refreshes and "
+                     f"{self.state['changed_since_clear']:.2f} changed frames since last clear")
+        self._save()
+
+    def _previous_frame(self):
+        """
+        Return the frame the panel shows, or None if it is unknown.
+        Another process may have updated the panel since this one did, so a
+        frame in memory is only used while it matches the persisted fingerprint.
+        """
+        expected = self.state.get('last_frame_hash')
+        if expected is None:
+            return None
+        if self._last_frame is not None and self._last_frame_hash == expected:
+            return self._last_frame
+        frame = load_panel_frame(self.frame_file)
+        try:
+            if frame is None or frame_fingerprint(frame) != expected:
+                return None
+        except ValueError as e:
+            logger.warning(f"Persisted panel frame {self.frame_file} is corrupt: {e}")
+            return None
+        self._last_frame, self._last_frame_hash = frame, expected
+        return frame
+
+    def _remember(self, frame):
+        """Keep the frame now on the panel in memory and on disk."""
+        if frame is None:
+            self._last_frame = self._last_frame_hash = None
+        else:
+            self._last_frame = _keep(frame)
+            self._last_frame_hash = frame_fingerprint(frame)
+            save_panel_frame(self.frame_file, self._last_frame)
+        self.state['last_frame_hash'] = self._last_frame_hash
+
+    def _save(self):
+        save_panel_state(self.panel, self.state, self.state_file)
@@ -0,0 +1,295 @@
+"""
+On-disk cache of panel-ready frame buffers.
+Rendering a flag (resize, quantize to the panel palette, pack) produces the
+same bytes every time for the same source image and display settings, so the
+packed frame is stored once, run-length compressed, and read back directly
+on later updates.
+"""
+
+import os
+import json
+import contextlib
+import time
+import fcntl
+import hashlib
+import logging
+import threading
+
+from .rle import RleFrame, MAGIC as RLE_MAGIC
+from .quantize import metric_key
+
+logger = logging.getLogger(__name__)
+
+# Base directory of this project (~/Flags)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RENDER_CACHE_DIR = os.path.join(BASE_DIR, "render_cache")
+INDEX_FILE = "index.json"
+# Held while the index is read, modified and written back, so processes
+# sharing the cache (server, cron updates, prerender) do not lose entries
+INDEX_LOCK_FILE = "index.lock"
+
+# Default disk budget; a full 800x480 frame is 192 KB raw, so this holds every
+# flag even uncompressed
+DEFAULT_MAX_MB = 64
+
+
+def render_settings_key(width, height, palette, dither, layout, metric=None):
+    """
+    Build the part of a cache key that depends only on the display settings.
+
+    Args:
+        width (int): Frame width in pixels.
+        height (int): Frame height in pixels.
+        palette (sequence): The panel colors as (r, g, b) tuples.
+        dither (str): Name of the dithering mode used for quantization.
+        layout (str): Name of the layout the flag was placed with.
+        metric (str, optional): Color distance the palette lookup table was built with.
+
+    Returns:
+        str: e.g. ``800x480-d9969ec4-floyd-steinberg-lab2-stretch2``.
+    """
+    palette_hash = hashlib.blake2b(json.dumps([list(c) for c in palette]).encode(),
+                                   digest_size=4).hexdigest()
+    if metric:
+        dither = f"{dither}-{metric_key(metric)}"
+    return f"{width}x{height}-{palette_hash}-{dither}-{layout}"
+
+
+def render_key(code, width, height, palette, dither, layout, metric=None):
+    """
+    Build the cache key of one rendered frame.
+
+    Args:
+        code (str): Country code (cca2) of the flag.
+        Other arguments as for render_settings_key.
+
+    Returns:
+        str: A key that is also safe to use as a file name.
+    """
+    return f"{code.lower()}-{render_settings_key(width, height, palette, dither, layout, metric)}"
+
+
+def source_stamp(source):
+    """Return (mtime_ns, size) of a source file, or None if it has none."""
+    if not source:
+        return None
+    try:
+        stat = os.stat(source)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _source_id(source):
+    """Return the source path relative to the project, so caches can be copied between machines."""
+    if not source:
+        return None
+    source = os.path.abspath(source)
+    if source.startswith(BASE_DIR + os.sep):
+        return os.path.relpath(source, BASE_DIR)
+    return source
+
+
+class RenderCache:
+    """
+    Stores packed frames as one file per entry plus a JSON index, evicting
+    the least recently used entries once the disk budget is exceeded.
+    An entry is dropped when the source image it was rendered from changes.
+    Cache hits only note their time in memory; it is merged into the index
+    the next time this process writes it, so a hit costs no disk write.
+    """
+
+    def __init__(self, cache_dir=RENDER_CACHE_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        """
+        Initialize the render cache.
+
+        Args:
+            cache_dir (str, optional): Directory holding the frames and the index.
+            max_bytes (int, optional): Disk budget for the stored frames.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # Last use of entries hit since the index was last written, by key
+        self._recent = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, settings):
+        """
+        Create a cache from the ``display`` configuration section.
+
+        Args:
+            settings (dict): May contain ``render_cache`` (False disables the cache)
+                and ``render_cache_mb`` (disk budget in megabytes).
+
+        Returns:
+            RenderCache: The cache, or None if it is disabled.
+        """
+        settings = settings or {}
+        if not settings.get('render_cache', True):
+            return None
+        return cls(max_bytes=int(float(settings.get('render_cache_mb', DEFAULT_MAX_MB)) * 1024 * 1024))
+
+    def get(self, key, source=None):
+        """
+        Look up a rendered frame.
+
+        Args:
+            key (str): Key from render_key.
+            source (str, optional): Path of the image the frame is rendered from.
+
+        Returns:
+            RleFrame: The packed frame, or None on a miss or a stale entry.
+                Entries written before compression was added are returned as bytes.
+        """
+        with self._lock:
+            index = self._load_index()
+            entry = index.get(key)
+            if entry is None:
+                return None
+            if entry.get('source') != _source_id(source):
+                # Rendered from another file of the flag (e.g. the PNG an SVG fell back to)
+                logger.debug(f"Render cache entry {key} was rendered from {entry.get('source')}")
+                return None
+            if entry.get('source_stamp') != source_stamp(source):
+                logger.debug(f"Render cache entry {key} is stale, dropping it")
+                self._drop(key, entry)
+                return None
+            try:
+                with open(os.path.join(self.cache_dir, entry['file']), 'rb') as f:
+                    frame = f.read()
+            except OSError:
+                frame = None
+            try:
+                if frame is None or len(frame) != entry['size']:
+                    raise ValueError("missing or truncated")
+                if frame.startswith(RLE_MAGIC):
+                    frame = RleFrame(frame)
+            except ValueError as e:
+                logger.warning(f"Render cache entry {key} is unreadable ({e}), dropping it")
+                self._drop(key, entry)
+                return None
+            self._recent[key] = time.time()
+            logger.debug(f"Render cache hit for {key}")
+            return frame
+
+    def put(self, key, frame, source=None):
+        """
+        Store a rendered frame and evict old entries if over budget.
+
+        Args:
+            key (str): Key from render_key.
+            frame (bytes-like or RleFrame): The packed frame.
+            source (str, optional): Path of the image the frame was rendered from.
+        """
+        data = frame.data if isinstance(frame, RleFrame) else RleFrame.from_frame(frame).data
+        with self._lock:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                file_name = f"{key}.rle"
+                path = os.path.join(self.cache_dir, file_name)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+
+                with self._index_lock():
+                    index = self._load_index()
+                    index[key] = {
+                        'file': file_name,
+                        'size': len(data),
+                        'source': _source_id(source),
+                        'source_stamp': source_stamp(source),
+                        'last_used': time.time(),
+                    }
+                    self._recent.pop(key, None)
+                    self._merge_recent(index)
+                    self._evict(index)
+                    self._save_index(index)
+            except Exception as e:
+                logger.error(f"Error writing render cache entry {key}: {e}")
+
+    def invalidate(self, code=None):
+        """
+        Drop cached frames.
+
+        Args:
+            code (str, optional): Only drop frames of this country code.
+        """
+        with self._lock, self._index_lock():
+            index = self._load_index()
+            prefix = f"{code.lower()}-" if code else ""
+            for key in [k for k in index if k.startswith(prefix)]:
+                self._remove(index, key)
+            self._save_index(index)
+
+    def _drop(self, key, entry):
+        """
+        Remove one entry, re-reading the index under the file lock; the entry
+        is kept if another process has rewritten it in the meantime.
+        """
+        with self._index_lock():
+            index = self._load_index()
+            if index.get(key) == entry:
+                self._remove(index, key)
+                self._save_index(index)
+
+    def _evict(self, index):
+        """Remove least recently used entries until the budget is met."""
+        total = sum(entry['size'] for entry in index.values())
+        for key in sorted(index, key=lambda k: index[k]['last_used']):
+            if total <= self.max_bytes:
+                break
+            total -= index[key]['size']
+            logger.debug(f"Evicting {key} from render cache")
+            self._remove(index, key)
+
+    def _remove(self, index, key):
+        self._recent.pop(key, None)
+        entry = index.pop(key)
+        try:
+            os.remove(os.path.join(self.cache_dir, entry['file']))
+        except OSError:
+            pass
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.cache_dir, INDEX_FILE), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @contextlib.contextmanager
+    def _index_lock(self):
+        """Hold an exclusive lock on the index across processes."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(os.path.join(self.cache_dir, INDEX_LOCK_FILE), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _merge_recent(self, index):
+        """Move the last use of entries hit by this process into the index."""
+        for key, last_used in self._recent.items():
+            entry = index.get(key)
+            if entry is not None and entry.get('last_used', 0) < last_used:
+                entry['last_used'] = last_used
+        self._recent.clear()
+
+    def _save_index(self, index):
+        """
+        Write the index, replacing the file atomically.
+        Must be called with the index lock held.
+        """
+        self._merge_recent(index)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = os.path.join(self.cache_dir, INDEX_FILE)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(index, f, indent=2)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"Error saving render cache index: {e}")
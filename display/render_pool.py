@@ -0,0 +1,180 @@
+"""
+Worker processes for the CPU-heavy render stages (resize, quantize, pack).
+Rendering a flag holds the GIL for most of a second on the Pi, which stalls
+every other Flask request while it runs on a request thread. In a worker
+process it does not, and the packed frame comes back through a shared memory
+slot instead of being pickled through the result pipe.
+"""
+
+import os
+import queue
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .layout import LAYOUT_STRETCH
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 1
+# One packed 800x480 frame
+DEFAULT_SLOT_SIZE = 800 * 480 // 2
+
+# Per-process state of a worker, set up by _init_worker
+_slots = None
+
+
+def _init_worker(slots, backend):
+    """
+    Set up a worker process. Spawned workers re-import the server's main
+    module first, which must not import a panel driver at module level; any
+    driver the worker loads afterwards uses the given backend, so it never
+    claims the GPIO pins the server process is using.
+    """
+    global _slots
+    os.environ['EPD_BACKEND'] = backend
+    _slots = slots
+
+
+def _warm(panel, dithers, metric):
+    """Load the renderer and the panel's lookup tables ahead of the first real frame."""
+    from .panel_profiles import get_profile
+    get_profile(*panel).prepare(dithers, metric)
+    return os.getpid()
+
+
+def _render(image, width, height, dither, metric, layout, code, panel, slot):
+    """
+    Render one frame in a worker.
+
+    Args:
+        panel (tuple): (name, rotation) of the panel profile.
+
+    Returns:
+        int or bytes: Length of the frame written to the slot, or the frame
+            itself if it does not fit.
+    """
+    from .epaper import render_frame
+    from .panel_profiles import get_profile
+
+    profile = get_profile(*panel)
+    frame = render_frame(profile, image, width, height, profile.quantizer(dither, metric),
+                         layout, code)
+    view = memoryview(_slots[slot]).cast('B')
+    if len(frame) > len(view):
+        return bytes(frame)
+    view[:len(frame)] = frame
+    return len(frame)
+
+
+def _panel(profile):
+    """Identify a panel profile to the workers, which look up their own copy."""
+    from .panel_profiles import DEFAULT_PANEL
+    if profile is None:
+        return DEFAULT_PANEL, 0
+    return profile.name, profile.rotation
+
+
+class RenderPool:
+    """
+    A small persistent pool of render worker processes.
+    Each worker owns no hardware; frames are returned through shared memory slots.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, slot_size=DEFAULT_SLOT_SIZE):
+        """
+        Initialize the pool; no process is started until start() or render().
+
+        Args:
+            workers (int, optional): Number of worker processes.
+            slot_size (int, optional): Bytes per shared memory frame slot.
+        """
+        self.workers = workers
+        self.slot_size = slot_size
+        self._context = multiprocessing.get_context('spawn')
+        self._executor = None
+        self._slots = []
+        self._free_slots = queue.Queue()
+        self._lock = threading.Lock()
+
+    def start(self, dither=None, metric=None, profile=None):
+        """
+        Start the workers and prewarm them in the background.
+
+        Args:
+            dither (str, optional): Dither mode to load ahead of the first frame,
+                or ``auto`` for all of them.
+            metric (str, optional): Color metric to load ahead of the first frame.
+            profile (PanelProfile, optional): Panel whose tables to load; defaults
+                to the default panel.
+        """
+        from .quantize import DITHER_MODES, DITHER_AUTO, DEFAULT_DITHER, DEFAULT_METRIC
+
+        # With per-flag dither selection any mode may be needed
+        modes = DITHER_MODES if dither == DITHER_AUTO else (dither or DEFAULT_DITHER,)
+        executor = self._get_executor()[0]
+        for _ in range(self.workers):
+            executor.submit(_warm, _panel(profile), modes, metric or DEFAULT_METRIC)
+        logger.info(f"Render pool started with {self.workers} worker(s)")
+
+    def render(self, image, width, height, dither, metric, layout=None, code=None, profile=None):
+        """
+        Render a frame in a worker process and wait for it.
+
+        Args:
+            image (PIL.Image): The image to render.
+            width (int): Frame width.
+            height (int): Frame height.
+            dither (str): Dither mode.
+            metric (str): Color metric.
+            layout (str, optional): How the image is placed on the panel.
+            code (str, optional): Country code of the flag, for layouts with text.
+            profile (PanelProfile, optional): Panel the frame is for; defaults to
+                the default panel.
+
+        Returns:
+            bytes: The packed frame buffer.
+        """
+        executor, slots, free_slots = self._get_executor()
+        slot = free_slots.get()
+        try:
+            future = executor.submit(_render, image, width, height, dither, metric,
+                                     layout or LAYOUT_STRETCH, code, _panel(profile), slot)
+            result = future.result()
+            if isinstance(result, bytes):
+                return result
+            return bytes(memoryview(slots[slot]).cast('B')[:result])
+        except BrokenProcessPool:
+            # A crashed worker breaks the executor; start a fresh one next time
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+        finally:
+            free_slots.put(slot)
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+            logger.debug("Render pool shut down")
+
+    def _get_executor(self):
+        """Return (executor, slots, free slot queue), starting the executor if needed."""
+        with self._lock:
+            if self._executor is None:
+                # Two slots per worker, so a frame can be copied out while the next renders
+                self._slots = [self._context.RawArray('B', self.slot_size)
+                               for _ in range(2 * self.workers)]
+                self._free_slots = queue.Queue()
+                for slot in range(len(self._slots)):
+                    self._free_slots.put(slot)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=self._context,
+                                                     initializer=_init_worker,
+                                                     initargs=(self._slots, 'simulated'))
+            return self._executor, self._slots, self._free_slots
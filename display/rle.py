@@ -0,0 +1,186 @@
+"""
+Run-length compressed panel frames.
+Flag frames are mostly long runs of one color, so a 192 KB packed frame
+usually compresses to a few KB. RleFrame keeps the compressed form and
+decodes it chunk by chunk while it is sent to the panel, without building
+the whole raw buffer first.
+
+Encoding (PackBits with an extra long-run code), after a header of
+MAGIC, version and raw length:
+    0x00-0x7F  n + 1 literal bytes follow
+    0x80       long run: u16 count (little endian), then the byte to repeat
+    0x81-0xFF  repeat the next byte 257 - n times (2-128)
+"""
+
+import re
+import struct
+
+MAGIC = b"FRLE"
+VERSION = 1
+HEADER = struct.Struct("<4sBI")
+
+# Bytes per decoded chunk; matches the default spidev transfer size
+DEFAULT_CHUNK_SIZE = 4096
+
+_RUN = re.compile(rb"(.)\1{2,}", re.S)
+_MAX_LITERAL = 128
+_MAX_SHORT_RUN = 128
+_MAX_LONG_RUN = 0xFFFF
+
+
+def _encode_literal(out, data):
+    for start in range(0, len(data), _MAX_LITERAL):
+        piece = data[start:start + _MAX_LITERAL]
+        out.append(len(piece) - 1)
+        out += piece
+
+
+def _encode_run(out, value, count):
+    while count:
+        if count > _MAX_SHORT_RUN:
+            n = min(count, _MAX_LONG_RUN)
+            out.append(0x80)
+            out += struct.pack("<H", n)
+        else:
+            n = count
+            if n < 2:
+                out.append(0)
+            else:
+                out.append(257 - n)
+        out.append(value)
+        count -= n
+
+
+def encode(frame):
+    """
+    Compress a packed frame.
+
+    Args:
+        frame (bytes-like): The raw packed frame.
+
+    Returns:
+        bytes: Header followed by the run-length encoded frame.
+    """
+    data = bytes(frame)
+    out = bytearray(HEADER.pack(MAGIC, VERSION, len(data)))
+    position = 0
+    for match in _RUN.finditer(data):
+        start, end = match.span()
+        if start > position:
+            _encode_literal(out, data[position:start])
+        _encode_run(out, data[start], end - start)
+        position = end
+    if position < len(data):
+        _encode_literal(out, data[position:])
+    return bytes(out)
+
+
+def iter_decode(data, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Decode a compressed frame incrementally.
+
+    Args:
+        data (bytes-like): Output of encode.
+        chunk_size (int, optional): Size of the yielded chunks; only the last may be shorter.
+
+    Yields:
+        bytes: Consecutive pieces of the raw frame.
+
+    Raises:
+        ValueError: If the data is not a valid compressed frame.
+    """
+    view = memoryview(data)
+    try:
+        magic, version, raw_length = HEADER.unpack_from(view, 0)
+    except struct.error:
+        raise ValueError("truncated run-length encoded frame")
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a run-length encoded frame")
+    buffer = bytearray()
+    produced = 0
+    position = HEADER.size
+    end = len(view)
+    while position < end:
+        control = view[position]
+        # Bytes the code takes after the control byte
+        size = control + 1 if control < 0x80 else 3 if control == 0x80 else 1
+        if position + 1 + size > end:
+            raise ValueError(f"run at offset {position} is truncated")
+        if control < 0x80:
+            buffer += view[position + 1:position + 1 + size]
+        elif control == 0x80:
+            count, = struct.unpack_from("<H", view, position + 1)
+            buffer += bytes((view[position + 3],)) * count
+        else:
+            buffer += bytes((view[position + 1],)) * (257 - control)
+        position += 1 + size
+        if produced + len(buffer) > raw_length:
+            raise ValueError(f"frame decodes to more than {raw_length} bytes")
+        while len(buffer) >= chunk_size:
+            yield bytes(buffer[:chunk_size])
+            del buffer[:chunk_size]
+            produced += chunk_size
+    if buffer:
+        produced += len(buffer)
+        yield bytes(buffer)
+    if produced != raw_length:
+        raise ValueError(f"decoded {produced} bytes, expected {raw_length}")
+
+
+class RleFrame:
+    """
+    A packed frame held in run-length compressed form.
+    Behaves enough like a frame buffer for the display path: ``len()`` is the
+    raw length, ``chunks()`` streams the raw bytes and ``bytes()`` decodes it.
+    """
+
+    def __init__(self, data):
+        """
+        Wrap compressed frame data.
+
+        Args:
+            data (bytes): Output of encode.
+
+        Raises:
+            ValueError: If the data is not a valid compressed frame.
+        """
+        try:
+            magic, version, self.raw_length = HEADER.unpack_from(data, 0)
+        except struct.error:
+            raise ValueError("truncated run-length encoded frame")
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a run-length encoded frame")
+        self.data = bytes(data)
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Compress a raw packed frame."""
+        return cls(encode(frame))
+
+    def chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Yield the raw frame in pieces of chunk_size bytes."""
+        return iter_decode(self.data, chunk_size)
+
+    def __len__(self):
+        return self.raw_length
+
+    def __bytes__(self):
+        return b"".join(self.chunks(1 << 16))
+
+
+def frame_chunks(frame, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Iterate over any frame in raw pieces of chunk_size bytes.
+
+    Args:
+        frame: An RleFrame or a bytes-like raw frame.
+
+    Yields:
+        bytes-like: Consecutive pieces of the raw frame.
+    """
+    if isinstance(frame, RleFrame):
+        yield from frame.chunks(chunk_size)
+        return
+    view = memoryview(frame)
+    for offset in range(0, len(view), chunk_size):
+        yield view[offset:offset + chunk_size]
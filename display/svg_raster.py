@@ -0,0 +1,180 @@
+"""
+Panel-resolution flags rasterized from SVG.
+Upscaling the 320 px PNGs in flag_cache/ to the panel is blurry, and the blur
+is what makes flat flag colors need heavy dithering. When a flag's SVG is
+stored in flag_svg/ it is rasterized once at the size it is shown at, and the
+bitmap is cached in render_cache/svg/ keyed on the SVG's hash and that size.
+Rasterizing needs the optional CairoSVG package (and the cairo library).
+"""
+
+import os
+import glob
+import hashlib
+import logging
+from io import BytesIO
+
+from PIL import Image
+
+try:
+    import cairosvg
+except (ImportError, OSError):
+    # OSError: the package is installed but the cairo library is missing
+    cairosvg = None
+
+from .render_cache import BASE_DIR, RENDER_CACHE_DIR
+from .layout import flatten
+
+logger = logging.getLogger(__name__)
+
+SVG_DIR = os.path.join(BASE_DIR, "flag_svg")
+RASTER_DIR = os.path.join(RENDER_CACHE_DIR, "svg")
+
+
+def rasterize_svg(svg, width, height):
+    """
+    Rasterize an SVG to fit width x height at its own aspect ratio.
+
+    Args:
+        svg (bytes): The SVG document.
+        width (int): Maximum width.
+        height (int): Maximum height.
+
+    Returns:
+        PIL.Image: An RGB image as large as fits, touching the box on at least one side.
+    """
+    png = cairosvg.svg2png(bytestring=svg, output_width=width)
+    image = Image.open(BytesIO(png))
+    if image.height > height:
+        png = cairosvg.svg2png(bytestring=svg, output_height=height)
+        image = Image.open(BytesIO(png))
+    # Transparent parts of a flag show the panel's white
+    return flatten(image)
+
+
+class SvgRasterCache:
+    """
+    Rasterizes flag SVGs once per SVG content and size and keeps the bitmaps on disk.
+    """
+
+    def __init__(self, svg_dir=SVG_DIR, cache_dir=RASTER_DIR, rasterize=None):
+        """
+        Initialize the cache.
+
+        Args:
+            svg_dir (str, optional): Directory holding the ``<code>.svg`` flags.
+            cache_dir (str, optional): Directory for the rasterized bitmaps.
+            rasterize (callable, optional): ``(svg bytes, width, height) -> PIL.Image``;
+                defaults to rasterize_svg.
+        """
+        self.svg_dir = svg_dir
+        self.cache_dir = cache_dir
+        self.rasterize = rasterize or rasterize_svg
+
+    @classmethod
+    def from_config(cls, settings):
+        """
+        Create a raster cache from the ``display`` configuration section.
+
+        Args:
+            settings (dict): May contain ``svg_flags`` (False disables SVG flags).
+
+        Returns:
+            SvgRasterCache: The cache, or None if SVG flags are disabled or
+                CairoSVG is not available.
+        """
+        settings = settings or {}
+        if not settings.get('svg_flags', True):
+            return None
+        if cairosvg is None:
+            logger.info("CairoSVG not available, using the PNG flags")
+            return None
+        return cls()
+
+    def svg_path(self, code):
+        """Return the SVG path of a country code."""
+        return os.path.join(self.svg_dir, f"{code.lower()}.svg")
+
+    def source(self, code, width, height):
+        """
+        Return the SVG a flag at this size is loaded from, or None if there is
+        none or it failed to rasterize, in which case get falls back to the PNG.
+        """
+        svg_path = self.svg_path(code)
+        try:
+            with open(svg_path, 'rb') as f:
+                svg = f.read()
+        except OSError:
+            return None
+        if os.path.exists(self._raster_path(code, svg, width, height, ".failed")):
+            return None
+        return svg_path
+
+    def _raster_path(self, code, svg, width, height, ext=".png"):
+        """Return the cache file of an SVG's bitmap at a size."""
+        digest = hashlib.blake2b(svg, digest_size=8).hexdigest()
+        return os.path.join(self.cache_dir, f"{code.lower()}-{digest}-{width}x{height}{ext}")
+
+    def get(self, code, width, height):
+        """
+        Return a flag rasterized to fit width x height.
+
+        Args:
+            code (str): Country code (cca2).
+            width (int): Width of the area the flag is shown in.
+            height (int): Height of that area.
+
+        Returns:
+            PIL.Image or None: The RGB bitmap, or None if there is no SVG of the
+                flag or it cannot be rasterized.
+        """
+        svg_path = self.svg_path(code)
+        try:
+            with open(svg_path, 'rb') as f:
+                svg = f.read()
+        except OSError:
+            return None
+        path = self._raster_path(code, svg, width, height)
+        if os.path.exists(self._raster_path(code, svg, width, height, ".failed")):
+            return None
+
+        try:
+            with Image.open(path) as img:
+                image = img.convert("RGB")
+        except (OSError, ValueError):
+            image = self._rasterize(code, svg, path, width, height)
+            if image is None:
+                return None
+        # Frames rendered from this bitmap are revalidated against the SVG
+        image.filename = svg_path
+        return image
+
+    def _rasterize(self, code, svg, path, width, height):
+        """
+        Rasterize an SVG and store the bitmap, replacing older ones of this size.
+        A failure is recorded next to the bitmaps, so the flag is loaded (and
+        its cached frames validated) from the PNG until the SVG changes.
+        """
+        try:
+            image = self.rasterize(svg, width, height)
+        except Exception as e:
+            logger.error(f"Error rasterizing flag SVG of {code}, using the PNG: {e}")
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(self._raster_path(code, svg, width, height, ".failed"), 'w') as f:
+                    f.write(f"{e}\n")
+            except OSError:
+                pass
+            return None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for ext in ("png", "failed"):
+                pattern = os.path.join(self.cache_dir, f"{code.lower()}-*-{width}x{height}.{ext}")
+                for stale in glob.glob(pattern):
+                    os.remove(stale)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            image.save(tmp_path, format="PNG")
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Error saving rasterized flag {path}: {e}")
+        logger.info(f"Rasterized flag SVG of {code} at {image.width}x{image.height}")
+        return image
@@ -30,7 +30,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from app import create_app
 from scripts.config_manager import load_config
 from scripts.prepare_country_data import prepare_country_data
-from scripts.update_flag import update_flag_safely
+from scripts.update_flag import update_flag_safely, update_grid_safely
 
 # Import display manager
 try:
@@ -63,8 +63,12 @@ def update_flag_display():
     try:
         logger.info("Scheduled flag update starting...")
         
-        # Update the flag without specifying a country (will use random)
-        success = update_flag_safely(None)
+        if settings.get('mode') == 'grid':
+            # Show several flags at once, see the grid_shape display setting
+            success = update_grid_safely(settings.get('grid_source', 'region'))
+        else:
+            # Update the flag without specifying a country (will use random)
+            success = update_flag_safely(None)
         
         logger.info("Scheduled flag update completed")
     except Exception as e:
@@ -188,12 +192,18 @@ if __name__ == '__main__':
         display_config['headless'] = True
     
     if DISPLAY_AVAILABLE:
+        display_config['display'] = config.get('display', {})
         display_manager = get_display_manager(display_config)
+        # Close a warm display session cleanly on shutdown
+        atexit.register(display_manager.close_display)
         if display_manager.is_display_available():
             if display_manager.is_mock_display():
                 print("Mock display initialized for development")
             else:
                 print("E-Paper display initialized successfully")
+                # Render frames off the request threads, with workers ready before the first update
+                if display_manager.start_render_pool():
+                    print("Render workers started")
         else:
             print("Running in headless mode - physical display not available")
     else:
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Measure the colors of every flag in flag_cache/ and write the stats index
+(render_cache/flag_stats.json) that ``dither: auto`` picks dither modes from.
+Flags are loaded as for the panel (from the SVG when there is one), so the
+entries match the images the render path looks them up with.
+
+Prints the mode each flag gets with the configured threshold. Flags missing
+from the index are analyzed when they are first rendered instead.
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+from collections import Counter
+
+# Add project root and scripts directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config_manager import load_config
+
+os.environ['EPD_BACKEND'] = 'simulated'
+from display.flag_atlas import find_flags
+from display.flag_stats import build_flag_stats, choose_dither, STATS_FILE, DEFAULT_THRESHOLD
+from display.quantize import DEFAULT_METRIC
+from display.panel_profiles import load_profile
+from main import flag_source, load_flag_cache
+
+# main configures debug logging on import; replace it with the script's own
+logging.basicConfig(level=logging.INFO, force=True,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Analyze flag colors for automatic dither selection')
+    parser.add_argument('--output', default=STATS_FILE, help='Path of the stats index')
+    parser.add_argument('--summary', action='store_true', help='Only print the summary, not every flag')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    settings = load_config().get('display', {})
+    metric = settings.get('color_metric', DEFAULT_METRIC)
+    threshold = float(settings.get('auto_dither_threshold', DEFAULT_THRESHOLD))
+    palette = load_profile(settings).palette
+
+    start = time.perf_counter()
+    sources = {code: flag_source(code) for code in find_flags()}
+    flags = build_flag_stats({code: source for code, source in sources.items() if source},
+                             palette, metric, args.output, load=load_flag_cache)
+    modes = {code: choose_dither(stats, threshold) for code, stats in flags.items()}
+
+    if not args.summary:
+        for code, stats in flags.items():
+            print(f"{code:>4} {modes[code]:<16} mapping error {stats['mapping_error']:6.2f}  "
+                  f"edges {stats['edges']:.3f}  fit error {stats['fit_error']:6.2f}")
+    counts = ", ".join(f"{mode} {count}" for mode, count in Counter(modes.values()).most_common())
+    print(f"Analyzed {len(flags)} flags in {time.perf_counter() - start:.1f}s "
+          f"(threshold {threshold:g}): {counts}")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark the full e-paper update path on any Linux box.
+
+Runs DisplayManager.display_image against the simulated panel backend
+(waveshare_epd.epdconfig.Simulated) from several threads at once and reports
+end-to-end latency, time spent waiting for the display locks and what the
+driver sent over the simulated SPI bus. Timings are reported in real-panel
+seconds, i.e. divided by --time-scale.
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import statistics
+import threading
+
+# Add project root and scripts directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config_manager import load_config
+
+os.environ['EPD_BACKEND'] = 'simulated'
+from display.manager import DisplayManager
+
+logging.basicConfig(level=logging.WARNING,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FLAG_CACHE_DIR = os.path.join(BASE_DIR, "flag_cache")
+
+
+def load_flags(count):
+    """Load a random sample of cached flag images."""
+    from PIL import Image
+
+    names = sorted(f for f in os.listdir(FLAG_CACHE_DIR) if f.endswith('.png'))
+    images = []
+    for name in random.sample(names, min(count, len(names))):
+        with Image.open(os.path.join(FLAG_CACHE_DIR, name)) as img:
+            images.append(img.convert('RGB'))
+    return images
+
+
+def run_benchmark(manager, images, updates, concurrency):
+    """
+    Push updates through the manager from concurrent threads.
+
+    Returns:
+        list: (latency seconds, succeeded) per update.
+    """
+    results = []
+    results_lock = threading.Lock()
+    queue = list(range(updates))
+
+    def worker():
+        while True:
+            with results_lock:
+                if not queue:
+                    return
+                index = queue.pop()
+            start = time.perf_counter()
+            ok = manager.display_image(images[index % len(images)])
+            with results_lock:
+                results.append((time.perf_counter() - start, ok))
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Benchmark display updates against the simulated panel')
+    parser.add_argument('--updates', type=int, default=8, help='Number of display updates')
+    parser.add_argument('--concurrency', type=int, default=2, help='Threads issuing updates')
+    parser.add_argument('--time-scale', type=float, default=0.01,
+                        help='Simulated time per real-panel second (1.0 = real time)')
+    parser.add_argument('--warm', action='store_true', help='Use a warm panel session')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    scale = args.time_scale
+
+    settings = dict(load_config().get('display', {}))
+    settings.update({
+        'backend': 'simulated',
+        'sim_time_scale': scale,
+        'warm_session': args.warm,
+        'sleep_delay': 3600,
+    })
+    # Scale the BUSY timeouts along with the simulated panel
+    settings['busy_timeouts'] = {
+        phase: timeout * scale
+        for phase, timeout in settings.get('busy_timeouts', {}).items()
+    }
+    manager = DisplayManager({'display': settings})
+    if not manager.is_display_available():
+        logger.error("Simulated display could not be initialized")
+        sys.exit(1)
+
+    from waveshare_epd import epdconfig
+
+    images = load_flags(args.updates)
+    epdconfig.sim_reset_stats()
+    wall_start = time.perf_counter()
+    results = run_benchmark(manager, images, args.updates, args.concurrency)
+    wall = time.perf_counter() - wall_start
+    busy = manager.get_busy_durations()
+    manager.close_display()
+
+    latencies = sorted(latency / scale for latency, _ in results)
+    refresh = sum(busy.values()) / scale
+    stats = epdconfig.sim_stats()
+
+    print(f"Updates:        {len(results)} ({sum(ok for _, ok in results)} succeeded), "
+          f"{args.concurrency} threads, warm session {'on' if args.warm else 'off'}")
+    print(f"Wall time:      {wall / scale:.1f}s")
+    print(f"Latency:        mean {statistics.mean(latencies):.1f}s, "
+          f"median {statistics.median(latencies):.1f}s, max {latencies[-1]:.1f}s")
+    print(f"Lock wait:      ~{max(0.0, statistics.mean(latencies) - refresh):.1f}s mean "
+          f"(latency minus {refresh:.1f}s of BUSY per update)")
+    print("Busy phases:    " + ", ".join(f"{phase} {seconds / scale:.2f}s" for phase, seconds in busy.items()))
+    print(f"Driver traffic: {stats['module_inits']} module inits, {stats['gpio_writes']} GPIO writes, "
+          f"{stats['spi_transfers']} SPI transfers, {stats['commands']} commands, "
+          f"{stats['data_bytes']} data bytes, {stats['refreshes']} refreshes")
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Decode every flag in flag_cache/ into the memory-mapped flag atlas
+(render_cache/flags.atlas), so flag lookups never inflate a PNG.
+
+The atlas is only rebuilt when a flag image was added, removed or changed,
+so the script is cheap to run from cron or after download_flags.py.
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from display.flag_atlas import FlagAtlas, build_flag_atlas, find_flags, ATLAS_FILE
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Build the memory-mapped atlas of decoded flag images')
+    parser.add_argument('--force', action='store_true', help='Rebuild even if the atlas is up to date')
+    parser.add_argument('--output', default=ATLAS_FILE, help='Path of the atlas file')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    sources = find_flags()
+
+    if not args.force and FlagAtlas(args.output).is_current(sources):
+        print(f"Flag atlas is up to date ({len(sources)} flags)")
+        sys.exit(0)
+
+    start = time.perf_counter()
+    count = build_flag_atlas(sources, args.output)
+    print(f"Decoded {count} flags in {time.perf_counter() - start:.1f}s "
+          f"({os.path.getsize(args.output) / 1024 / 1024:.1f} MB)")
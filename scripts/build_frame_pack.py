@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Render every flag in flag_cache/ for the configured display and write them
+into the memory-mapped frame pack (render_cache/flags.pack). Flags are loaded
+exactly as for the panel (from the SVG when there is one), so the pack entries
+carry the same source stamps the runtime checks them against.
+
+The pack is only rebuilt when a flag image was added, removed or changed, or
+when the display size or render settings differ from the ones it was built
+for, so the script is cheap to run from cron or after download_flags.py.
+Rendering runs against the simulated panel backend and never touches the
+hardware, so it is safe to run while the server is up.
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+
+# Add project root and scripts directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config_manager import load_config
+
+os.environ['EPD_BACKEND'] = 'simulated'
+from display.epaper import EPaperDisplay
+from display.frame_pack import FramePack, build_frame_pack, PACK_FILE
+from display.flag_atlas import find_flags
+from main import flag_source, load_flag_cache
+
+# main configures debug logging on import; replace it with the script's own
+logging.basicConfig(level=logging.INFO, force=True,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def find_sources():
+    """
+    Find the flags to pack and the file the runtime loads each of them from.
+
+    Returns:
+        dict: Source path (SVG or PNG) keyed by lower-case country code.
+    """
+    sources = {}
+    for code in find_flags():
+        source = flag_source(code)
+        if source is not None:
+            sources[code] = source
+    return sources
+
+
+def render_flags(display, sources, width, height):
+    """
+    Render every flag through the panel pipeline.
+
+    Yields:
+        tuple: (country code, packed frame, source path)
+    """
+    for code, path in sources.items():
+        start = time.perf_counter()
+        img = load_flag_cache(code)
+        if img is None:
+            logger.warning(f"Could not load the flag of {code}, skipping")
+            continue
+        frame = display.prepare_frame(img, width, height, cache_key=code)
+        logger.debug(f"Rendered {code} in {time.perf_counter() - start:.2f}s")
+        yield code, bytes(frame), path
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Build the memory-mapped frame pack of all flags')
+    parser.add_argument('--force', action='store_true', help='Rebuild even if the pack is up to date')
+    parser.add_argument('--output', default=PACK_FILE, help='Path of the pack file')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    settings = dict(load_config().get('display', {}))
+    # Render from the flag images (or the render cache), never from the old pack
+    settings.update({'backend': 'simulated', 'sim_time_scale': 0.0, 'frame_pack': False})
+    display = EPaperDisplay(settings)
+    if not display.initialized:
+        logger.error("Display driver could not be loaded for rendering")
+        sys.exit(1)
+
+    width, height = display.frame_size(settings.get('width'), settings.get('height'))
+    settings_key = display.render_settings_key(width, height)
+    sources = find_sources()
+
+    if not args.force and FramePack(args.output).is_current(sources, settings_key):
+        print(f"Frame pack is up to date ({len(sources)} flags, {settings_key})")
+        sys.exit(0)
+
+    start = time.perf_counter()
+    count = build_frame_pack(render_flags(display, sources, width, height), settings_key, args.output)
+    print(f"Packed {count} flags for {settings_key} in {time.perf_counter() - start:.1f}s "
+          f"({os.path.getsize(args.output) / 1024 / 1024:.1f} MB)")
+    display.close()
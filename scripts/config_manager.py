@@ -14,6 +14,9 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # Config file path
 CONFIG_FILE = os.path.join(BASE_DIR, "config", "config.json")
 
+# Number of recently shown flags remembered for the grid display
+FLAG_HISTORY_SIZE = 12
+
 # Create a backup of the original config file if it doesn't exist
 def _ensure_config_file():
     """Ensure config file exists with default values"""
@@ -25,6 +28,7 @@ def _ensure_config_file():
                 "update_at_startup": True,
                 "mode": "random",
                 "fixed_country": "",
+                "grid_source": "region",
                 "last_updated": "",
                 "use_fixed_times": False,
                 "time_interval": 30,
@@ -100,6 +104,12 @@ def update_current_flag(config, country_data):
     if 'timezones' in country_data:
         config['current_flag']['timezones'] = country_data['timezones']
     
+    # Remember recently shown flags, most recent first
+    code = country_data.get('cca2')
+    if code:
+        history = [c for c in config.get('flag_history', []) if c != code]
+        config['flag_history'] = [code] + history[:FLAG_HISTORY_SIZE - 1]
+    
     # Update last_updated timestamp
     config['flag_display']['last_updated'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
@@ -118,6 +128,11 @@ def update_flag_display_settings(settings):
     config['flag_display'].update(settings)
     return save_config(config)
 
+def get_flag_history():
+    """Get the country codes of recently shown flags, most recent first"""
+    config = load_config()
+    return config.get('flag_history', [])
+
 def get_current_flag_info():
     """Get current flag information from config"""
     config = load_config()
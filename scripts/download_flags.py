@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import os
+import sys
 import requests
 import json
 from io import BytesIO
@@ -11,6 +12,8 @@ from PIL import Image
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 CACHE_FILE = os.path.join(BASE_DIR, "country_cache.json")
 FLAG_CACHE_DIR = os.path.join(BASE_DIR, "flag_cache")
+COUNTRIES_FILE = os.path.join(BASE_DIR, "app", "static", "data", "countries.json")
+FLAG_SVG_DIR = os.path.join(BASE_DIR, "flag_svg")
 
 def load_cache():
     if os.path.exists(CACHE_FILE):
@@ -57,5 +60,30 @@ def download_all_flags():
         flag_url = country["flags"]["png"]
         get_flag(flag_url)
 
+def download_svg_flags():
+    """Download the SVG flag of every country into flag_svg/<code>.svg, skipping existing ones."""
+    with open(COUNTRIES_FILE, 'r') as f:
+        countries = json.load(f)
+    os.makedirs(FLAG_SVG_DIR, exist_ok=True)
+
+    for country in countries.values():
+        code = country.get('cca2', '').lower()
+        url = country.get('flags', {}).get('svg')
+        path = os.path.join(FLAG_SVG_DIR, f"{code}.svg")
+        if not code or not url or os.path.exists(path):
+            continue
+        response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'})
+        if response.status_code == 200:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(response.content)
+            os.replace(tmp_path, path)
+            print(f"Downloaded SVG flag: {url}")
+        else:
+            print(f"Error {response.status_code}: {response.reason}")
+
 if __name__ == "__main__":
-    download_all_flags()
\ No newline at end of file
+    if "--svg" in sys.argv:
+        download_svg_flags()
+    else:
+        download_all_flags()
\ No newline at end of file
@@ -0,0 +1,166 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+"""
+In-memory LRU cache of decoded flag images.
+Looking a flag up used to open and decode its PNG again on every request and
+left the file handle open until the image was garbage collected. Cached
+images are fully loaded RGB copies, so the file is closed right after
+decoding, and repeated lookups of the same flag cost a stat() call.
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_MB = 32
+
+
+class FlagImageCache:
+    """
+    A thread-safe, size-bounded LRU of decoded flag images keyed by country code.
+    Returned images are shared between callers and must not be modified in place.
+    """
+
+    def __init__(self, flag_dir, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            flag_dir (str): Directory holding the ``<code>.png`` flag images.
+            max_bytes (int, optional): Budget for the decoded pixel data.
+        """
+        self.flag_dir = flag_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, flag_dir, settings):
+        """
+        Create a cache from the display settings.
+
+        Args:
+            flag_dir (str): Directory holding the flag images.
+            settings (dict): The ``display`` section of the config.
+
+        Returns:
+            FlagImageCache or None: None if ``image_cache_mb`` is 0.
+        """
+        max_mb = settings.get('image_cache_mb', DEFAULT_MAX_MB)
+        if not max_mb:
+            return None
+        return cls(flag_dir, int(max_mb * 1024 * 1024))
+
+    def path(self, code):
+        """Return the flag image path of a country code."""
+        return os.path.join(self.flag_dir, f"{code.lower()}.png")
+
+    def get(self, code):
+        """
+        Return the decoded flag image of a country.
+
+        Args:
+            code (str): The country code.
+
+        Returns:
+            PIL.Image or None: The RGB image, or None if no flag image exists.
+        """
+        key = code.lower()
+        path = self.path(code)
+        try:
+            st = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._remove(key)
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        image = load_image(path)
+        if image is None:
+            return None
+        size = image.width * image.height * len(image.getbands())
+        with self._lock:
+            self._remove(key)
+            if size <= self.max_bytes:
+                self._entries[key] = (image, stamp, size)
+                self._size += size
+                self._evict()
+        return image
+
+    def invalidate(self, code=None):
+        """Drop one country's image, or every image if code is None."""
+        with self._lock:
+            if code is None:
+                self._entries.clear()
+                self._size = 0
+            else:
+                self._remove(code.lower())
+
+    def stats(self):
+        """
+        Return the cache counters.
+
+        Returns:
+            dict: hits, misses, evictions, entries and bytes in use.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._size,
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[2]
+
+    def _evict(self):
+        """Drop the least recently used images until the cache fits its budget."""
+        while self._size > self.max_bytes and self._entries:
+            key, entry = self._entries.popitem(last=False)
+            self._size -= entry[2]
+            self.evictions += 1
+            logger.debug(f"Evicted decoded flag image {key}")
+
+
+def load_image(path):
+    """
+    Decode an image file into a fully loaded RGB image and close the file.
+
+    Args:
+        path (str): The image file.
+
+    Returns:
+        PIL.Image or None: The image, or None if it could not be read.
+    """
+    from display.layout import flatten
+
+    try:
+        with Image.open(path) as img:
+            image = flatten(img)
+    except (OSError, ValueError) as e:
+        logger.error(f"Error loading flag image {path}: {e}")
+        return None
+    # The render cache and frame pack validate frames against their source file
+    image.filename = path
+    return image
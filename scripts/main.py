@@ -18,6 +18,7 @@ from PIL import Image
 from config_manager import load_config, update_current_flag, get_flag_display_settings
 # Import the display lock
 from display_lock import DisplayLock
+from flag_image_cache import FlagImageCache, load_image
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -29,13 +30,29 @@ CACHE_FILE     = os.path.join(BASE_DIR, "app", "static", "data", "countries.json
 FLAG_CACHE_DIR = os.path.join(BASE_DIR, "flag_cache")
 FLAG_INFO_PATH = os.path.join(BASE_DIR, "app", "static", "data", "flag.json")
 
-# Try to import e-paper display library, but handle case when not available
-try:
-    from waveshare_epd import epd7in3f
-    EPD_AVAILABLE = True
-except (ImportError, RuntimeError, ModuleNotFoundError) as e:
-    logging.warning(f"E-paper display module not available: {e}")
-    EPD_AVAILABLE = False
+# Add parent directory to path for the display package
+sys.path.insert(0, BASE_DIR)
+from display.refresh_policy import RefreshPolicy
+from display.flag_atlas import FlagAtlas
+from display.svg_raster import SvgRasterCache
+from display.layout import flag_area, DEFAULT_LAYOUT
+from display.lazy_image import LazyImage
+from display.panel_profiles import load_profile
+
+
+def load_driver():
+    """
+    Import the e-paper display library, or return None when it is not available.
+    Importing it probes the board, so this only happens when the panel is
+    driven from here, not whenever another module (or a render worker
+    re-importing the server) imports this one.
+    """
+    try:
+        from waveshare_epd import epd7in3f
+        return epd7in3f
+    except (ImportError, RuntimeError, ModuleNotFoundError) as e:
+        logging.warning(f"E-paper display module not available: {e}")
+        return None
 
 
 def load_cache():
@@ -70,13 +87,72 @@ def get_country_data():
     logging.info("Fetched country data and saved to cache")
     return country_dict
 
+# Flag sources, created on first use from the display settings
+_svg_rasters = None
+_svg_size = None
+_flag_atlas = None
+_flag_images = None
+_flag_images_configured = False
+
+def _configure_flag_images():
+    global _svg_rasters, _svg_size, _flag_atlas, _flag_images, _flag_images_configured
+    if not _flag_images_configured:
+        settings = load_config().get('display', {})
+        _svg_rasters = SvgRasterCache.from_config(settings)
+        # SVG flags are rasterized at the size the layout shows them at on the panel
+        profile = load_profile(settings)
+        left, top, right, bottom = flag_area(profile.width, profile.height,
+                                             settings.get('layout', DEFAULT_LAYOUT))
+        _svg_size = (right - left, bottom - top)
+        _flag_atlas = FlagAtlas.from_config(settings)
+        _flag_images = FlagImageCache.from_config(FLAG_CACHE_DIR, settings)
+        _flag_images_configured = True
+
+def get_flag_image_cache():
+    """Return the decoded flag image cache, or None if it is disabled."""
+    _configure_flag_images()
+    return _flag_images
+
 def load_flag_cache(code):
-    os.makedirs(FLAG_CACHE_DIR, exist_ok=True)
+    """Return the decoded flag image of a country code, or None if it is not cached."""
+    _configure_flag_images()
+    if _svg_rasters is not None:
+        image = _svg_rasters.get(code, *_svg_size)
+        if image is not None:
+            return image
     fname = os.path.join(FLAG_CACHE_DIR, f"{code.lower()}.png")
+    if _flag_atlas is not None:
+        # Pre-decoded pixels, if the atlas is up to date
+        image = _flag_atlas.get_image(code, fname)
+        if image is not None:
+            return image
+    cache = _flag_images
+    if cache is not None:
+        image = cache.get(code)
+        logging.debug(f"Flag image cache: {cache.stats()}")
+        return image
     if os.path.exists(fname):
-        return Image.open(fname)
+        return load_image(fname)
     return None
 
+def flag_source(code):
+    """Return the file load_flag_cache would read the flag of a country code from, or None."""
+    _configure_flag_images()
+    if _svg_rasters is not None:
+        svg_path = _svg_rasters.source(code, *_svg_size)
+        if svg_path is not None:
+            return svg_path
+    fname = os.path.join(FLAG_CACHE_DIR, f"{code.lower()}.png")
+    return fname if os.path.exists(fname) else None
+
+def lazy_flag(country_data):
+    """
+    Return the flag of a country as a LazyImage: get_flag only runs (and may
+    download the image) when a display actually renders it.
+    """
+    code = country_data.get('cca2', '')
+    return LazyImage(lambda: get_flag(country_data), flag_source(code) if code else None)
+
 def save_flag_cache(code, img):
     os.makedirs(FLAG_CACHE_DIR, exist_ok=True)
     fname = os.path.join(FLAG_CACHE_DIR, f"{code.lower()}.png")
@@ -195,7 +271,7 @@ def update_flag_metadata(country):
     
     logging.info(f"Updated flag metadata for {country['name']['common']}")
 
-def display_flag(epd=None, country_name=None):
+def display_flag(epd=None, country_name=None, refresh_policy=None, force_refresh=False):
     logging.info("Displaying flag...")
     
     # Load configuration
@@ -223,16 +299,17 @@ def display_flag(epd=None, country_name=None):
         country = data[random_key]
         logging.info(f"Selected random country: {country['name']['common']}")
 
-    # Get the flag image
-    img = get_flag(country)
-    
     # Update metadata
     update_flag_metadata(country)
     
     # If we're in headless mode or e-paper display is not available, we just update the metadata
-    if headless_mode or not EPD_AVAILABLE or epd is None:
+    # without loading the flag image
+    if headless_mode or epd is None:
         logging.info(f"Running in headless mode - metadata updated for {country['name']['common']}")
         return country
+
+    # Get the flag image
+    img = get_flag(country)
     
     # If we reach here, we have a valid epd instance and should update the physical display
     # Use a display lock to prevent concurrent access to GPIO pins
@@ -248,7 +325,22 @@ def display_flag(epd=None, country_name=None):
             
             # Display the flag on the e-paper display
             resized = img.resize((display_width, display_height), Image.Resampling.LANCZOS)
-            epd.display(epd.getbuffer(resized))
+            buffer = epd.getbuffer(resized)
+
+            # Nothing to do if the panel already shows this exact frame
+            if refresh_policy is not None and not force_refresh and refresh_policy.is_unchanged(buffer):
+                logging.info(f"Display already shows the flag for {country['name']['common']}, skipping refresh")
+                return country
+
+            # Only clear first when enough ghosting has built up; otherwise
+            # a single refresh replaces the old flag directly
+            if refresh_policy is not None and refresh_policy.needs_clear():
+                logging.info("Ghosting threshold reached, clearing display first")
+                epd.Clear()
+                refresh_policy.record_clear(epd.getclearbuffer())
+            epd.display(buffer)
+            if refresh_policy is not None:
+                refresh_policy.record_refresh(buffer)
             logging.info(f"Displayed flag for {country['name']['common']}")
             
             # Put the display to sleep
@@ -262,7 +354,9 @@ def display_flag(epd=None, country_name=None):
 
 if __name__ == "__main__":
     try:
-        country_arg = sys.argv[1] if len(sys.argv) > 1 else None
+        args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+        country_arg = args[0] if args else None
+        force_refresh = "--force" in sys.argv
 
         # Check if we should run in headless mode (either from config or command line)
         config = load_config()
@@ -270,7 +364,8 @@ if __name__ == "__main__":
         if "--headless" in sys.argv:
             headless = True
 
-        if headless or not EPD_AVAILABLE:
+        epd7in3f = None if headless else load_driver()
+        if epd7in3f is None:
             # Headless mode - just update metadata
             logging.info("Running in headless mode")
             display_flag(None, country_arg)
@@ -287,9 +382,9 @@ if __name__ == "__main__":
                     epd = epd7in3f.EPD()
                     logging.info("Initializing display")
                     epd.init()
-                    epd.Clear()
 
-                    display_flag(epd, country_arg)
+                    refresh_policy = RefreshPolicy.from_config(config.get('display', {}))
+                    display_flag(epd, country_arg, refresh_policy, force_refresh)
                     
                     logging.info("Sleeping display")
                     epd.sleep()
@@ -302,7 +397,7 @@ if __name__ == "__main__":
         logging.error("Error: %s", e)
         traceback.print_exc()
         try:
-            if 'epd' in locals() and epd and EPD_AVAILABLE:
+            if 'epd' in locals() and epd and epd7in3f is not None:
                 epd7in3f.epdconfig.module_exit()
         except:
             pass
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pre-render the whole flag catalogue into the render cache.
+
+Every country in app/static/data/countries.json whose flag is in flag_cache/
+is loaded the way the panel loads it (from the SVG when there is one),
+resized, quantized and packed for the configured display across a pool of
+worker processes, and the packed frames are written to render_cache/. Scheduled
+updates then skip the CPU work entirely. The cache can be built on a faster
+machine and copied to the Pi with `rsync -a` (modification times must be kept
+for both flag_cache/ and render_cache/). Rendering uses the simulated panel
+backend and never touches the hardware.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import statistics
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Add project root and scripts directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config_manager import load_config
+
+os.environ['EPD_BACKEND'] = 'simulated'
+from display.epaper import EPaperDisplay
+from display.render_cache import RenderCache
+from display.rle import RleFrame
+from display.frame_pack import build_frame_pack
+from main import flag_source, load_flag_cache
+
+# main configures debug logging on import; replace it with the script's own
+logging.basicConfig(level=logging.INFO, force=True,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COUNTRIES_FILE = os.path.join(BASE_DIR, "app", "static", "data", "countries.json")
+
+# Renderer of the current worker process, created by _init_worker
+_display = None
+
+
+def render_settings(settings):
+    """Display settings for rendering only: simulated panel, no caches."""
+    return dict(settings, backend='simulated', sim_time_scale=0.0,
+                render_cache=False, frame_pack=False)
+
+
+def _init_worker(settings):
+    global _display
+    logging.getLogger().setLevel(logging.WARNING)
+    _display = EPaperDisplay(render_settings(settings))
+
+
+def _render(code, source, width, height):
+    """
+    Render one flag in a worker process.
+    The frame is compressed here, so only a few KB travel back to the parent.
+
+    Returns:
+        tuple: (code, RleFrame, source, seconds)
+    """
+    start = time.perf_counter()
+    img = load_flag_cache(code)
+    if img is None:
+        raise RuntimeError(f"Could not load the flag of {code} from {source}")
+    frame = _display.prepare_frame(img, width, height, cache_key=code)
+    return code, RleFrame.from_frame(frame), source, time.perf_counter() - start
+
+
+def find_countries(countries_file=COUNTRIES_FILE):
+    """
+    List the countries whose flag is cached.
+
+    Returns:
+        dict: Path of the file the runtime loads the flag from (SVG or PNG),
+        keyed by country code (cca2).
+    """
+    with open(countries_file, 'r') as f:
+        countries = json.load(f)
+    flags = {}
+    for name, country in sorted(countries.items()):
+        code = country.get('cca2', '')
+        path = flag_source(code) if code else None
+        if path is not None:
+            flags[code] = path
+        else:
+            logger.warning(f"No cached flag image for {name}, skipping")
+    return flags
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Pre-render all flags into the render cache')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes')
+    parser.add_argument('--force', action='store_true', help='Re-render flags that are already cached')
+    parser.add_argument('--pack', action='store_true', help='Also rebuild the frame pack from the results')
+    parser.add_argument('--summary', action='store_true', help='Only print the summary, not every flag')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    settings = load_config().get('display', {})
+    display = EPaperDisplay(render_settings(settings))
+    if not display.initialized:
+        logger.error("Display driver could not be loaded for rendering")
+        sys.exit(1)
+    width, height = display.frame_size(settings.get('width'), settings.get('height'))
+    settings_key = display.render_settings_key(width, height)
+
+    cache = RenderCache.from_config(dict(settings, render_cache=True))
+    flags = find_countries()
+    keys = {code: f"{code.lower()}-{settings_key}" for code in flags}
+    frames = {}
+    if not args.force:
+        for code, source in flags.items():
+            frame = cache.get(keys[code], source)
+            if frame is not None:
+                frames[code] = (frame, source)
+    todo = {code: source for code, source in flags.items() if code not in frames}
+    print(f"Rendering {len(todo)} of {len(flags)} flags for {settings_key} "
+          f"with {args.workers} workers ({len(frames)} already cached)")
+
+    timings = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(settings,)) as executor:
+        futures = [executor.submit(_render, code, source, width, height)
+                   for code, source in todo.items()]
+        for future in as_completed(futures):
+            try:
+                code, frame, source, seconds = future.result()
+            except Exception as e:
+                logger.error(f"Rendering failed: {e}")
+                continue
+            # Only this process writes the cache index
+            cache.put(keys[code], frame, source)
+            frames[code] = (frame, source)
+            timings[code] = seconds
+            if not args.summary:
+                print(f"{code:>4} {seconds * 1000:8.1f} ms")
+    wall = time.perf_counter() - start
+
+    if timings:
+        ordered = sorted(timings.items(), key=lambda item: item[1])
+        cpu = sum(timings.values())
+        print(f"Rendered {len(timings)} flags in {wall:.1f}s wall, {cpu:.1f}s CPU "
+              f"({cpu / wall:.1f}x parallel)")
+        print(f"Per flag: mean {statistics.mean(timings.values()) * 1000:.0f} ms, "
+              f"median {statistics.median(timings.values()) * 1000:.0f} ms, "
+              f"slowest {ordered[-1][0]} {ordered[-1][1] * 1000:.0f} ms")
+    failed = len(todo) - len(timings)
+
+    if args.pack:
+        build_frame_pack(((code, bytes(frame), source) for code, (frame, source) in frames.items()),
+                         settings_key)
+    display.close()
+    sys.exit(1 if failed else 0)
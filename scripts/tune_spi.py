@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark SPI transfer throughput at several clock speeds and chunk sizes,
+and store the fastest setting that transferred a test frame without errors
+in the `display` section of config/config.json.
+
+The transfers go through a pluggable backend. The default `loopback` backend
+drives the real spidev device and needs MOSI (GPIO 10) jumpered to MISO
+(GPIO 9) so every byte can be read back and verified.
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+
+# Add scripts directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config_manager import load_config, save_config
+from display_lock import DisplayLock
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Candidate settings; the panel controller is specified for up to ~20 MHz
+DEFAULT_SPEEDS = [2000000, 4000000, 8000000, 10000000, 16000000, 20000000]
+DEFAULT_CHUNK_SIZES = [1024, 4096]
+
+# One full 800x480 4-bit frame
+DEFAULT_FRAME_SIZE = 800 * 480 // 2
+
+
+class SpidevLoopbackBackend:
+    """spidev device with MOSI looped back to MISO."""
+
+    def __init__(self, bus=0, device=0):
+        import spidev
+        self.spi = spidev.SpiDev()
+        self.bus = bus
+        self.device = device
+        try:
+            with open('/sys/module/spidev/parameters/bufsiz') as f:
+                self.max_chunk_size = int(f.read().strip())
+        except (OSError, ValueError):
+            self.max_chunk_size = 4096
+
+    def open(self, speed_hz):
+        self.spi.open(self.bus, self.device)
+        self.spi.max_speed_hz = speed_hz
+        self.spi.mode = 0b00
+
+    def transfer(self, chunk):
+        """Send one chunk and return the bytes clocked back in."""
+        return bytes(self.spi.xfer3(bytes(chunk)))
+
+    def close(self):
+        self.spi.close()
+
+
+# Backends selectable with --backend
+BACKENDS = {
+    'loopback': SpidevLoopbackBackend,
+}
+
+
+def benchmark(backend, speed_hz, chunk_size, frame, rounds):
+    """
+    Transfer the test frame repeatedly and time it.
+
+    Returns:
+        tuple: (throughput in bytes per second, True if every byte was echoed back intact)
+    """
+    view = memoryview(frame)
+    verified = True
+    backend.open(speed_hz)
+    try:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for offset in range(0, len(view), chunk_size):
+                chunk = view[offset:offset + chunk_size]
+                if backend.transfer(chunk) != chunk:
+                    verified = False
+        elapsed = time.perf_counter() - start
+    finally:
+        backend.close()
+    return len(frame) * rounds / elapsed, verified
+
+
+def tune(backend, speeds, chunk_sizes, frame_size, rounds):
+    """
+    Benchmark every speed and chunk size combination.
+
+    Returns:
+        dict: The fastest verified setting, or None if none verified.
+    """
+    frame = os.urandom(frame_size)
+    max_chunk = getattr(backend, 'max_chunk_size', None)
+    best = None
+
+    print(f"{'speed (Hz)':>12} {'chunk':>7} {'KB/s':>9}  result")
+    for speed_hz in speeds:
+        for chunk_size in chunk_sizes:
+            if max_chunk and chunk_size > max_chunk:
+                continue
+            try:
+                throughput, verified = benchmark(backend, speed_hz, chunk_size, frame, rounds)
+            except Exception as e:
+                logger.warning(f"Transfer failed at {speed_hz} Hz / {chunk_size} B: {e}")
+                continue
+            print(f"{speed_hz:>12} {chunk_size:>7} {throughput / 1024:>9.1f}  "
+                  f"{'ok' if verified else 'CORRUPT'}")
+            if verified and (best is None or throughput > best['throughput']):
+                best = {'spi_speed_hz': speed_hz, 'spi_chunk_size': chunk_size,
+                        'throughput': throughput}
+    return best
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Auto-tune the e-paper SPI clock and chunk size')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='loopback',
+                        help='SPI backend to benchmark against')
+    parser.add_argument('--speeds', default=','.join(map(str, DEFAULT_SPEEDS)),
+                        help='Comma-separated SPI clock speeds in Hz')
+    parser.add_argument('--chunk-sizes', default=','.join(map(str, DEFAULT_CHUNK_SIZES)),
+                        help='Comma-separated transfer chunk sizes in bytes')
+    parser.add_argument('--frame-size', type=int, default=DEFAULT_FRAME_SIZE,
+                        help='Bytes transferred per round')
+    parser.add_argument('--rounds', type=int, default=3, help='Rounds per setting')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Report the best setting without saving it')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    speeds = [int(value) for value in args.speeds.split(',') if value]
+    chunk_sizes = [int(value) for value in args.chunk_sizes.split(',') if value]
+
+    # The benchmark drives the same bus as the panel, so keep other updates out
+    with DisplayLock() as lock:
+        if not lock.acquired:
+            logger.error("Could not acquire display lock, is an update running?")
+            sys.exit(1)
+        best = tune(BACKENDS[args.backend](), speeds, chunk_sizes, args.frame_size, args.rounds)
+
+    if best is None:
+        logger.error("No setting transferred the test frame correctly; config left unchanged")
+        sys.exit(1)
+
+    print(f"Fastest verified setting: {best['spi_speed_hz']} Hz, "
+          f"{best['spi_chunk_size']} byte chunks ({best['throughput'] / 1024:.1f} KB/s)")
+    if not args.dry_run:
+        config = load_config()
+        display = config.setdefault('display', {})
+        display['spi_speed_hz'] = best['spi_speed_hz']
+        display['spi_chunk_size'] = best['spi_chunk_size']
+        save_config(config)
+        print("Saved to config/config.json")
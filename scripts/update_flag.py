@@ -14,7 +14,7 @@ logger = logging.getLogger(__name__)
 
 # Import configuration
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from config_manager import load_config
+from config_manager import load_config, get_flag_history
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -22,7 +22,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # Try to import main with required functions
 try:
     # Only import display_flag function to avoid triggering GPIO initialization
-    from main import update_flag_metadata, get_country_by_name, get_country_data, get_flag
+    from main import update_flag_metadata, get_country_by_name, get_country_data, lazy_flag
     FLAG_FUNCTIONS_AVAILABLE = True
 except Exception as e:
     logger.error(f"Error importing flag functions: {e}")
@@ -35,7 +35,7 @@ except Exception as e:
     logger.error(f"Error importing display module: {e}")
     DISPLAY_AVAILABLE = False
 
-def update_flag_safely(country_name=None, force_cleanup=False):
+def update_flag_safely(country_name=None, force_cleanup=False, force_refresh=False):
     """
     Update flag with proper display handling.
     
@@ -43,6 +43,7 @@ def update_flag_safely(country_name=None, force_cleanup=False):
         country_name (str, optional): The name of the country whose flag to display.
                                      If None, a random country is chosen.
         force_cleanup (bool, optional): Whether to force clean up any stale locks.
+        force_refresh (bool, optional): Refresh the panel even if it already shows this flag.
         
     Returns:
         int: 0 for success, non-zero for error.
@@ -59,8 +60,8 @@ def update_flag_safely(country_name=None, force_cleanup=False):
             logger.info(f"Using fixed country from configuration: {fixed_country}")
             country_name = fixed_country
     
-    # Get display manager with current config
-    display_manager = get_display_manager(display_config)
+    # Get display manager with current config, including the hardware section
+    display_manager = get_display_manager(dict(display_config, display=config.get('display', {})))
     
     # If flag functions aren't available, we can't update anything
     if not FLAG_FUNCTIONS_AVAILABLE:
@@ -86,9 +87,6 @@ def update_flag_safely(country_name=None, force_cleanup=False):
             random_key = random.choice(list(data.keys()))
             country = data[random_key]
             
-        # Get flag image
-        flag_img = get_flag(country)
-        
         # Update metadata regardless of display availability
         update_flag_metadata(country)
         logger.info(f"Updated metadata for {country['name']['common']}")
@@ -97,6 +95,9 @@ def update_flag_safely(country_name=None, force_cleanup=False):
         if not DISPLAY_AVAILABLE or not display_manager.is_display_available():
             logger.info("Physical display not available - metadata updated only")
             return 0
+
+        # The flag image is only loaded (or downloaded) if the frame is not cached
+        flag_img = lazy_flag(country)
     except Exception as e:
         logger.error(f"Error preparing flag data: {e}")
         logger.debug(traceback.format_exc())
@@ -105,7 +106,8 @@ def update_flag_safely(country_name=None, force_cleanup=False):
     # Try to update the physical display
     try:
         # Display the flag image
-        success = display_manager.display_image(flag_img)
+        success = display_manager.display_image(flag_img, force_refresh=force_refresh,
+                                                cache_key=country.get('cca2'))
         
         if success:
             logger.info(f"Displayed flag for {country['name']['common']}")
@@ -118,10 +120,100 @@ def update_flag_safely(country_name=None, force_cleanup=False):
         logger.debug(traceback.format_exc())
         return 1
 
+def select_grid_countries(data, source, count, config):
+    """
+    Choose the countries shown in a grid.
+
+    Args:
+        data (dict): Country data keyed by name.
+        source (str): ``region`` for flags of the current flag's region, or
+            ``recent`` for the most recently shown flags.
+        count (int): Number of flags wanted.
+        config (dict): The loaded configuration.
+
+    Returns:
+        list: Country data dicts, at most count of them.
+    """
+    by_code = {country.get('cca2'): country for country in data.values() if country.get('cca2')}
+    if source == 'recent':
+        return [by_code[code] for code in get_flag_history() if code in by_code][:count]
+    if source != 'region':
+        raise ValueError(f"Unknown grid source {source!r}, expected 'region' or 'recent'")
+
+    import random
+    current = get_country_by_name(data, config.get('current_flag', {}).get('country'))
+    region = (current or random.choice(list(by_code.values()))).get('region')
+    neighbours = [country for country in by_code.values()
+                  if country.get('region') == region and country is not current]
+    chosen = random.sample(neighbours, min(len(neighbours), count - (1 if current else 0)))
+    return ([current] if current else []) + chosen
+
+def update_grid_safely(source='region', shape=None, force_refresh=False):
+    """
+    Show a grid of flags on the display, e.g. 2x2 flags of the current region.
+    The current flag and its metadata are left unchanged.
+    
+    Args:
+        source (str, optional): ``region`` or ``recent``, see select_grid_countries.
+        shape (str, optional): Grid shape such as ``2x2`` or ``3x2``; defaults to
+                               the ``grid_shape`` display setting.
+        force_refresh (bool, optional): Refresh the panel even if it already shows this grid.
+        
+    Returns:
+        int: 0 for success, non-zero for error.
+    """
+    from display.grid import parse_shape, DEFAULT_GRID_SHAPE
+
+    config = load_config()
+    display_config = config.get('flag_display', {})
+    shape = shape or config.get('display', {}).get('grid_shape', DEFAULT_GRID_SHAPE)
+    display_manager = get_display_manager(dict(display_config, display=config.get('display', {})))
+
+    if not FLAG_FUNCTIONS_AVAILABLE:
+        logger.error("Required flag functions not available")
+        return 1
+    if not DISPLAY_AVAILABLE or not display_manager.is_display_available():
+        logger.info("Physical display not available - nothing to show a grid on")
+        return 0
+
+    try:
+        columns, rows = parse_shape(shape)
+        countries = select_grid_countries(get_country_data(), source, columns * rows, config)
+        if not countries:
+            logger.warning(f"No flags to show for grid source '{source}'")
+            return 1
+        flags = [(country['cca2'], lazy_flag(country)) for country in countries]
+    except Exception as e:
+        logger.error(f"Error preparing grid: {e}")
+        logger.debug(traceback.format_exc())
+        return 1
+
+    try:
+        if display_manager.display_grid(flags, shape, force_refresh=force_refresh):
+            logger.info(f"Displayed {shape} grid of {', '.join(code for code, _ in flags)}")
+        else:
+            logger.warning("Grid display update failed")
+        return 0
+    except Exception as e:
+        logger.error(f"Error updating grid: {e}")
+        logger.debug(traceback.format_exc())
+        return 1
+
 if __name__ == "__main__":
     try:
-        country_arg = sys.argv[1] if len(sys.argv) > 1 else None
-        exit_code = update_flag_safely(country_arg)
+        args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+        country_arg = args[0] if args else None
+        options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:]
+                       if arg.startswith('--') and '=' in arg)
+        if 'grid' in options:
+            # e.g. --grid=region --shape=3x2
+            exit_code = update_grid_safely(options['grid'], options.get('shape'),
+                                           force_refresh="--force" in sys.argv)
+        else:
+            exit_code = update_flag_safely(country_arg, force_refresh="--force" in sys.argv)
+        # A one-shot run must not leave a warm session open behind it
+        if DISPLAY_AVAILABLE:
+            get_display_manager().close_display()
         sys.exit(exit_code)
     except Exception as e:
         logger.error(f"Unhandled error: {e}")
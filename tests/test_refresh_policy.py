@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from display import refresh_policy
+from display.panel_profiles import get_profile
+from display.refresh_policy import RefreshPolicy, changed_pixel_ratio
+from display.rle import RleFrame
+
+
+@pytest.fixture(params=[True, False], ids=["numpy", "python"])
+def packing(request, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(refresh_policy, "np", None)
+
+
+def test_changed_pixel_ratio_2bpp(packing):
+    profile = get_profile('epd7in3g')
+    assert profile.bits_per_pixel == 2
+    white = profile.clear_buffer()
+    # One pixel changed in every byte: a quarter of the 2-bpp pixels
+    current = bytes(b ^ 0x01 for b in white)
+    assert changed_pixel_ratio(white, current, profile.bits_per_pixel) == pytest.approx(0.25)
+    assert changed_pixel_ratio(white, RleFrame.from_frame(current),
+                               profile.bits_per_pixel) == pytest.approx(0.25)
+    # Black everywhere changes every pixel
+    assert changed_pixel_ratio(white, profile.clear_buffer(0), 2) == pytest.approx(1.0)
+
+
+def test_changed_pixel_ratio_4bpp(packing):
+    previous = b"\x11" * 100
+    current = b"\x10" * 100
+    assert changed_pixel_ratio(previous, current) == pytest.approx(0.5)
+
+
+def test_policy_uses_panel_packing(tmp_path):
+    profile = get_profile('epd7in3g')
+    policy = RefreshPolicy(profile.name, clear_every=0, ghosting_threshold=0.5,
+                           state_file=str(tmp_path / "state.json"),
+                           bits_per_pixel=profile.bits_per_pixel)
+    policy.record_clear(profile.clear_buffer())
+    policy.record_refresh(bytes(b ^ 0x01 for b in profile.clear_buffer()))
+    assert policy.state['changed_since_clear'] == pytest.approx(0.25)
+    assert not policy.needs_clear()
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from display.rle import RleFrame, encode, iter_decode, HEADER
+
+
+def test_round_trip():
+    frame = bytes(1000) + bytes(range(256)) + b"\x11" * 300 + b"\x42" * 70000
+    assert bytes(RleFrame.from_frame(frame)) == frame
+
+
+@pytest.mark.parametrize("frame", [b"\x11" * 300, b"\x11" * 70000, bytes(range(200))])
+def test_truncated_run_raises_value_error(frame):
+    data = encode(frame)
+    for cut in range(HEADER.size + 1, len(data)):
+        with pytest.raises(ValueError):
+            list(iter_decode(data[:cut]))
+
+
+def test_truncated_header_raises_value_error():
+    with pytest.raises(ValueError):
+        list(iter_decode(encode(b"\x11" * 10)[:HEADER.size - 1]))
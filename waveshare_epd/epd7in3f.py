@@ -29,11 +29,9 @@
 #
 
 import logging
+import time
 from . import epdconfig
-
-import PIL
-from PIL import Image
-import io
+from .framebuffer import EPD7IN3F_PALETTE, pack_pixels, clear_frame, palette_image
 
 # Display resolution
 EPD_WIDTH       = 800
@@ -41,6 +39,57 @@ EPD_HEIGHT      = 480
 
 logger = logging.getLogger(__name__)
 
+# Register initialisation sequence replayed by EPD.init: (command, parameters)
+INIT_SEQUENCE = (
+    (0xAA, bytes((0x49, 0x55, 0x20, 0x08, 0x09, 0x18))),   # CMDH
+    (0x01, bytes((0x3F, 0x00, 0x32, 0x2A, 0x0E, 0x2A))),
+    (0x00, bytes((0x5F, 0x69))),
+    (0x03, bytes((0x00, 0x54, 0x00, 0x44))),
+    (0x05, bytes((0x40, 0x1F, 0x1F, 0x2C))),
+    (0x06, bytes((0x6F, 0x1F, 0x1F, 0x22))),
+    (0x08, bytes((0x6F, 0x1F, 0x1F, 0x22))),
+    (0x13, bytes((0x00, 0x04))),   # IPC
+    (0x30, bytes((0x3C,))),
+    (0x41, bytes((0x00,))),   # TSE
+    (0x50, bytes((0x3F,))),
+    (0x60, bytes((0x02, 0x00))),
+    (0x61, bytes((0x03, 0x20, 0x01, 0xE0))),
+    (0x82, bytes((0x1E,))),
+    (0x84, bytes((0x00,))),
+    (0x86, bytes((0x00,))),   # AGID
+    (0xE3, bytes((0x2F,))),
+    (0xE0, bytes((0x00,))),   # CCSET
+    (0xE6, bytes((0x00,))),   # TSSET
+)
+
+# The 7 colors supported by the panel, in palette index order; shared with
+# the panel profile of the render pipeline
+PALETTE = EPD7IN3F_PALETTE
+
+# Upper bound in seconds for each BUSY phase; None waits forever
+BUSY_TIMEOUTS = {
+    'RESET':     10,
+    'POWER_ON':  10,
+    'REFRESH':   60,
+    'POWER_OFF': 10,
+}
+
+class EPDBusyTimeout(TimeoutError):
+    """Raised when the panel keeps BUSY asserted past the phase timeout."""
+
+    def __init__(self, phase, timeout):
+        super().__init__("e-Paper still busy after %.1fs in phase %s" % (timeout, phase))
+        self.phase = phase
+        self.timeout = timeout
+
+def pack_4bpp(indices):
+    """Pack one palette index per byte into two 4-bit pixels per byte.
+
+    The even pixel goes into the high nibble, the odd pixel into the low one.
+    Returns a bytearray that can be handed to the SPI layer as-is.
+    """
+    return pack_pixels(indices, 4)
+
 class EPD:
     def __init__(self):
         self.reset_pin = epdconfig.RST_PIN
@@ -56,6 +105,11 @@ class EPD:
         self.RED    = 0x0000ff   #   0100
         self.YELLOW = 0x00ffff   #   0101
         self.ORANGE = 0x0080ff   #   0110
+
+        # Per-phase BUSY timeouts and the duration of the last wait per phase
+        self.busy_timeouts = dict(BUSY_TIMEOUTS)
+        self.busy_durations = {}
+        self.module_open = False
         
     # Hardware reset
     def reset(self):
@@ -78,130 +132,67 @@ class EPD:
         epdconfig.spi_writebyte([data])
         epdconfig.digital_write(self.cs_pin, 1)
         
-    # send a lot of data   
+    # send a lot of data; accepts bytes, bytearray, memoryview or NumPy arrays
     def send_data2(self, data):
         epdconfig.digital_write(self.dc_pin, 1)
         epdconfig.digital_write(self.cs_pin, 0)
         epdconfig.spi_writebyte2(data)
         epdconfig.digital_write(self.cs_pin, 1)
+
+    # send data produced piece by piece, e.g. by a streaming decoder
+    def send_data_chunks(self, chunks):
+        epdconfig.digital_write(self.dc_pin, 1)
+        epdconfig.digital_write(self.cs_pin, 0)
+        for chunk in chunks:
+            epdconfig.spi_writebyte2(chunk)
+        epdconfig.digital_write(self.cs_pin, 1)
+
+    # send a command byte and its whole parameter block in one burst
+    def send_command_data(self, command, data):
+        self.send_command(command)
+        if len(data):
+            self.send_data2(data)
         
-    def ReadBusyH(self):
-        logger.debug("e-Paper busy H")
-        while(epdconfig.digital_read(self.busy_pin) == 0):      # 0: busy, 1: idle
-            epdconfig.delay_ms(5)
-        logger.debug("e-Paper busy H release")
+    def ReadBusyH(self, phase='BUSY'):
+        logger.debug("e-Paper busy H (%s)", phase)
+        timeout = self.busy_timeouts.get(phase)
+        start = time.monotonic()
+        # 0: busy, 1: idle; block on the rising edge instead of polling
+        released = epdconfig.digital_wait_high(self.busy_pin, timeout)
+        elapsed = time.monotonic() - start
+        self.busy_durations[phase] = elapsed
+        if not released:
+            raise EPDBusyTimeout(phase, timeout)
+        logger.debug("e-Paper busy H release (%s, %.3fs)", phase, elapsed)
 
     def TurnOnDisplay(self):
         self.send_command(0x04) # POWER_ON
-        self.ReadBusyH()
+        self.ReadBusyH('POWER_ON')
 
-        self.send_command(0x12) # DISPLAY_REFRESH
-        self.send_data(0X00)
-        self.ReadBusyH()
+        self.send_command_data(0x12, b'\x00') # DISPLAY_REFRESH
+        self.ReadBusyH('REFRESH')
         
-        self.send_command(0x02) # POWER_OFF
-        self.send_data(0X00)
-        self.ReadBusyH()
+        self.send_command_data(0x02, b'\x00') # POWER_OFF
+        self.ReadBusyH('POWER_OFF')
         
     def init(self):
-        if (epdconfig.module_init() != 0):
-            return -1
+        # A warm session keeps SPI/GPIO open between updates
+        if not self.module_open:
+            if (epdconfig.module_init() != 0):
+                return -1
+            self.module_open = True
         # EPD hardware init start
         self.reset()
-        self.ReadBusyH()
+        self.ReadBusyH('RESET')
         epdconfig.delay_ms(30)
 
-        self.send_command(0xAA)    # CMDH
-        self.send_data(0x49)
-        self.send_data(0x55)
-        self.send_data(0x20)
-        self.send_data(0x08)
-        self.send_data(0x09)
-        self.send_data(0x18)
-
-        self.send_command(0x01)
-        self.send_data(0x3F)
-        self.send_data(0x00)
-        self.send_data(0x32)
-        self.send_data(0x2A)
-        self.send_data(0x0E)
-        self.send_data(0x2A)
-
-        self.send_command(0x00)
-        self.send_data(0x5F)
-        self.send_data(0x69)
-
-        self.send_command(0x03)
-        self.send_data(0x00)
-        self.send_data(0x54)
-        self.send_data(0x00)
-        self.send_data(0x44) 
-
-        self.send_command(0x05)
-        self.send_data(0x40)
-        self.send_data(0x1F)
-        self.send_data(0x1F)
-        self.send_data(0x2C)
-
-        self.send_command(0x06)
-        self.send_data(0x6F)
-        self.send_data(0x1F)
-        self.send_data(0x1F)
-        self.send_data(0x22)
-
-        self.send_command(0x08)
-        self.send_data(0x6F)
-        self.send_data(0x1F)
-        self.send_data(0x1F)
-        self.send_data(0x22)
-
-        self.send_command(0x13)    # IPC
-        self.send_data(0x00)
-        self.send_data(0x04)
-
-        self.send_command(0x30)
-        self.send_data(0x3C)
-
-        self.send_command(0x41)     # TSE
-        self.send_data(0x00)
-
-        self.send_command(0x50)
-        self.send_data(0x3F)
-
-        self.send_command(0x60)
-        self.send_data(0x02)
-        self.send_data(0x00)
-
-        self.send_command(0x61)
-        self.send_data(0x03)
-        self.send_data(0x20)
-        self.send_data(0x01) 
-        self.send_data(0xE0)
-
-        self.send_command(0x82)
-        self.send_data(0x1E) 
-
-        self.send_command(0x84)
-        self.send_data(0x00)
-
-        self.send_command(0x86)    # AGID
-        self.send_data(0x00)
-
-        self.send_command(0xE3)
-        self.send_data(0x2F)
-
-        self.send_command(0xE0)   # CCSET
-        self.send_data(0x00) 
-
-        self.send_command(0xE6)   # TSSET
-        self.send_data(0x00)
+        for command, data in INIT_SEQUENCE:
+            self.send_command_data(command, data)
         return 0
 
-    def getbuffer(self, image):
-        # Create a pallette with the 7 colors supported by the panel
-        pal_image = Image.new("P", (1,1))
-        pal_image.putpalette( (0,0,0,  255,255,255,  0,255,0,   0,0,255,  255,0,0,  255,255,0, 255,128,0) + (0,0,0)*249)
-
+    # quantize: optional callable mapping an RGB image to one palette index
+    # per pixel; defaults to Pillow's Floyd-Steinberg dithering
+    def getbuffer(self, image, quantize=None):
         # Check if we need to rotate the image
         imwidth, imheight = image.size
         if(imwidth == self.width and imheight == self.height):
@@ -212,36 +203,47 @@ class EPD:
             logger.warning("Invalid image dimensions: %d x %d, expected %d x %d" % (imwidth, imheight, self.width, self.height))
 
         # Convert the soruce image to the 7 colors, dithering if needed
-        image_7color = image_temp.convert("RGB").quantize(palette=pal_image)
-        buf_7color = bytearray(image_7color.tobytes('raw'))
+        if quantize is not None:
+            buf_7color = quantize(image_temp.convert("RGB"))
+        else:
+            image_7color = image_temp.convert("RGB").quantize(palette=palette_image(PALETTE))
+            buf_7color = image_7color.tobytes('raw')
 
         # PIL does not support 4 bit color, so pack the 4 bits of color
         # into a single byte to transfer to the panel
-        buf = [0x00] * int(self.width * self.height / 2)
-        idx = 0
-        for i in range(0, len(buf_7color), 2):
-            buf[idx] = (buf_7color[i] << 4) + buf_7color[i+1]
-            idx += 1
-            
-        return buf
+        return pack_4bpp(buf_7color)
 
+    # image: a packed frame buffer, or an object whose chunks() method
+    # yields the frame in pieces (compressed frames decoded on the fly)
     def display(self, image):
         self.send_command(0x10)
-        self.send_data2(image)
+        if hasattr(image, 'chunks'):
+            self.send_data_chunks(image.chunks())
+        else:
+            self.send_data2(image)
 
         self.TurnOnDisplay()
         
+    # color: a byte holding the same color code in both pixels, e.g. 0x11 for white
+    def getclearbuffer(self, color=0x11):
+        if color >> 4 != color & 0x0F or color & 0x0F >= len(PALETTE):
+            raise ValueError("Clear color must repeat one palette code in both nibbles: 0x%02X" % color)
+        return clear_frame(color & 0x0F, 4, self.width * self.height)
+
     def Clear(self, color=0x11):
         self.send_command(0x10)
-        self.send_data2([color] * int(self.height) * int(self.width/2))
+        self.send_data2(self.getclearbuffer(color))
 
         self.TurnOnDisplay()
 
-    def sleep(self):
-        self.send_command(0x07) # DEEP_SLEEP
-        self.send_data(0XA5)
+    def sleep(self, keep_open=False):
+        self.send_command_data(0x07, b'\xA5') # DEEP_SLEEP
+        if keep_open:
+            # The reset in the next init() wakes the panel; no need to wait
+            return
         
         epdconfig.delay_ms(2000)
         epdconfig.module_exit()
+        self.module_open = False
 ### END OF FILE ###
 
@@ -37,6 +37,45 @@ from ctypes import *
 
 logger = logging.getLogger(__name__)
 
+# Default transfer size of the spidev kernel driver
+SPIDEV_BUFSIZ_DEFAULT = 4096
+
+# Default SPI clock used by the Waveshare demo code
+SPI_SPEED_HZ_DEFAULT = 4000000
+
+
+def _byte_view(data):
+    """Return a flat, read-only byte view of data without copying it.
+
+    Anything exposing the buffer protocol (bytes, bytearray, memoryview,
+    NumPy arrays) is wrapped as-is; plain lists of ints are converted once.
+    """
+    if isinstance(data, (list, tuple)):
+        data = bytes(data)
+    view = memoryview(data)
+    if view.format != 'B' or view.ndim != 1:
+        view = view.cast('B')
+    return view
+
+
+def _poll_until_high(read, timeout, interval=0.005):
+    """Poll read() until it returns a high level or timeout seconds pass."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while read() == 0:
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+    return True
+
+
+def _spidev_bufsiz():
+    """Read the maximum transfer size of the spidev driver."""
+    try:
+        with open('/sys/module/spidev/parameters/bufsiz') as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return SPIDEV_BUFSIZ_DEFAULT
+
 
 class RaspberryPi:
     # Pin definition
@@ -59,29 +98,33 @@ class RaspberryPi:
         self.GPIO_PWR_PIN    = gpiozero.LED(self.PWR_PIN)
         self.GPIO_BUSY_PIN   = gpiozero.Button(self.BUSY_PIN, pull_up = False)
 
-        
+        # SPI clock and largest chunk a single spidev ioctl accepts
+        self.SPI_SPEED_HZ    = SPI_SPEED_HZ_DEFAULT
+        self.SPI_BUFSIZ      = _spidev_bufsiz()
+        self.SPI_CHUNK_SIZE  = self.SPI_BUFSIZ
+
+        # Output pin dispatch table and last level written to each pin
+        self._output_pins = {
+            self.RST_PIN: self.GPIO_RST_PIN,
+            self.DC_PIN:  self.GPIO_DC_PIN,
+            self.PWR_PIN: self.GPIO_PWR_PIN,
+        }
+        self._pin_levels = {}
 
     def digital_write(self, pin, value):
-        if pin == self.RST_PIN:
-            if value:
-                self.GPIO_RST_PIN.on()
-            else:
-                self.GPIO_RST_PIN.off()
-        elif pin == self.DC_PIN:
-            if value:
-                self.GPIO_DC_PIN.on()
-            else:
-                self.GPIO_DC_PIN.off()
-        # elif pin == self.CS_PIN:
-        #     if value:
-        #         self.GPIO_CS_PIN.on()
-        #     else:
-        #         self.GPIO_CS_PIN.off()
-        elif pin == self.PWR_PIN:
-            if value:
-                self.GPIO_PWR_PIN.on()
-            else:
-                self.GPIO_PWR_PIN.off()
+        # CS is driven by the SPI controller, so it has no entry here
+        device = self._output_pins.get(pin)
+        if device is None:
+            return
+        value = bool(value)
+        # DC stays high across consecutive data writes; skip redundant toggles
+        if self._pin_levels.get(pin) is value:
+            return
+        self._pin_levels[pin] = value
+        if value:
+            device.on()
+        else:
+            device.off()
 
     def digital_read(self, pin):
         if pin == self.BUSY_PIN:
@@ -95,6 +138,12 @@ class RaspberryPi:
         elif pin == self.PWR_PIN:
             return self.PWR_PIN.value
 
+    def digital_wait_high(self, pin, timeout=None):
+        if pin == self.BUSY_PIN:
+            # gpiozero signals the rising edge through an event, no polling
+            return self.GPIO_BUSY_PIN.wait_for_press(timeout)
+        return _poll_until_high(lambda: self.digital_read(pin), timeout)
+
     def delay_ms(self, delaytime):
         time.sleep(delaytime / 1000.0)
 
@@ -102,7 +151,23 @@ class RaspberryPi:
         self.SPI.writebytes(data)
 
     def spi_writebyte2(self, data):
-        self.SPI.writebytes2(data)
+        # Hand bufsiz-sized slices of the caller's buffer to spidev so that
+        # no intermediate list or copy of the frame is ever built
+        view = _byte_view(data)
+        chunk = self.SPI_CHUNK_SIZE
+        for start in range(0, len(view), chunk):
+            self.SPI.writebytes2(view[start:start + chunk])
+
+    def spi_configure(self, speed_hz=None, chunk_size=None):
+        if speed_hz:
+            self.SPI_SPEED_HZ = int(speed_hz)
+            try:
+                self.SPI.max_speed_hz = self.SPI_SPEED_HZ
+            except (OSError, TypeError):
+                pass    # device closed; module_init applies it on open
+        if chunk_size:
+            # spidev rejects transfers larger than its bufsiz parameter
+            self.SPI_CHUNK_SIZE = max(1, min(int(chunk_size), self.SPI_BUFSIZ))
 
     def DEV_SPI_write(self, data):
         self.DEV_SPI.DEV_SPI_SendData(data)
@@ -114,6 +179,7 @@ class RaspberryPi:
         return self.DEV_SPI.DEV_SPI_ReadData()
 
     def module_init(self, cleanup=False):
+        self._pin_levels.clear()
         self.GPIO_PWR_PIN.on()
         
         if cleanup:
@@ -141,7 +207,7 @@ class RaspberryPi:
         else:
             # SPI device, bus = 0, device = 0
             self.SPI.open(0, 0)
-            self.SPI.max_speed_hz = 4000000
+            self.SPI.max_speed_hz = self.SPI_SPEED_HZ
             self.SPI.mode = 0b00
         return 0
 
@@ -152,6 +218,7 @@ class RaspberryPi:
         self.GPIO_RST_PIN.off()
         self.GPIO_DC_PIN.off()
         self.GPIO_PWR_PIN.off()
+        self._pin_levels.clear()
         logger.debug("close 5V, Module enters 0 power consumption ...")
         
         if cleanup:
@@ -198,6 +265,9 @@ class JetsonNano:
     def digital_read(self, pin):
         return self.GPIO.input(self.BUSY_PIN)
 
+    def digital_wait_high(self, pin, timeout=None):
+        return _poll_until_high(lambda: self.digital_read(pin), timeout)
+
     def delay_ms(self, delaytime):
         time.sleep(delaytime / 1000.0)
 
@@ -205,8 +275,12 @@ class JetsonNano:
         self.SPI.SYSFS_software_spi_transfer(data[0])
 
     def spi_writebyte2(self, data):
-        for i in range(len(data)):
-            self.SPI.SYSFS_software_spi_transfer(data[i])
+        for byte in _byte_view(data):
+            self.SPI.SYSFS_software_spi_transfer(byte)
+
+    def spi_configure(self, speed_hz=None, chunk_size=None):
+        # Bit-banged SPI: clock and chunking are fixed by the sysfs library
+        logger.debug("SPI tuning is not supported on this platform")
 
     def module_init(self):
         self.GPIO.setmode(self.GPIO.BCM)
@@ -249,6 +323,7 @@ class SunriseX3:
 
         self.GPIO = Hobot.GPIO
         self.SPI = spidev.SpiDev()
+        self.SPI_SPEED_HZ = SPI_SPEED_HZ_DEFAULT
 
     def digital_write(self, pin, value):
         self.GPIO.output(pin, value)
@@ -256,6 +331,9 @@ class SunriseX3:
     def digital_read(self, pin):
         return self.GPIO.input(pin)
 
+    def digital_wait_high(self, pin, timeout=None):
+        return _poll_until_high(lambda: self.digital_read(pin), timeout)
+
     def delay_ms(self, delaytime):
         time.sleep(delaytime / 1000.0)
 
@@ -265,7 +343,14 @@ class SunriseX3:
     def spi_writebyte2(self, data):
         # for i in range(len(data)):
         #     self.SPI.writebytes([data[i]])
-        self.SPI.xfer3(data)
+        self.SPI.xfer3(_byte_view(data))
+
+    def spi_configure(self, speed_hz=None, chunk_size=None):
+        # xfer3 splits transfers itself, so only the clock is tunable here
+        if speed_hz:
+            self.SPI_SPEED_HZ = int(speed_hz)
+            if self.Flag:
+                self.SPI.max_speed_hz = self.SPI_SPEED_HZ
 
     def module_init(self):
         if self.Flag == 0:
@@ -282,7 +367,7 @@ class SunriseX3:
         
             # SPI device, bus = 0, device = 0
             self.SPI.open(2, 0)
-            self.SPI.max_speed_hz = 4000000
+            self.SPI.max_speed_hz = self.SPI_SPEED_HZ
             self.SPI.mode = 0b00
             return 0
         else:
@@ -301,22 +386,171 @@ class SunriseX3:
         self.GPIO.cleanup([self.RST_PIN, self.DC_PIN, self.CS_PIN, self.BUSY_PIN], self.PWR_PIN)
 
 
-if sys.version_info[0] == 2:
-    process = subprocess.Popen("cat /proc/cpuinfo | grep Raspberry", shell=True, stdout=subprocess.PIPE)
-else:
-    process = subprocess.Popen("cat /proc/cpuinfo | grep Raspberry", shell=True, stdout=subprocess.PIPE, text=True)
-output, _ = process.communicate()
-if sys.version_info[0] == 2:
-    output = output.decode(sys.stdout.encoding)
-
-if "Raspberry" in output:
-    implementation = RaspberryPi()
-elif os.path.exists('/sys/bus/platform/drivers/gpio-x3'):
-    implementation = SunriseX3()
-else:
-    implementation = JetsonNano()
+class Simulated:
+    """
+    Software model of the panel wiring for running the driver without hardware.
+    SPI writes are decoded into commands and frame data, and BUSY is held low
+    for as long as the real 7.3" 7-color panel would hold it.
+    """
+    # Pin definition
+    RST_PIN  = 17
+    DC_PIN   = 25
+    CS_PIN   = 8
+    BUSY_PIN = 24
+    PWR_PIN  = 18
+
+    # Seconds BUSY stays low after a reset pulse or one of these commands
+    BUSY_SECONDS = {
+        'RESET': 0.02,
+        0x04:    0.15,    # POWER_ON
+        0x12:    27.0,    # DISPLAY_REFRESH
+        0x02:    0.1,     # POWER_OFF
+    }
+
+    def __init__(self):
+        self.SPI_SPEED_HZ = SPI_SPEED_HZ_DEFAULT
+        self.SPI_CHUNK_SIZE = SPIDEV_BUFSIZ_DEFAULT
+        self.busy_seconds = dict(self.BUSY_SECONDS)
+        self.time_scale = 1.0
+        self.stuck_busy = False
+        self._levels = {}
+        self._busy_until = 0.0
+        self._command = None
+        self._frame = bytearray()
+        self.sim_reset_stats()
+
+    def _now(self):
+        return time.monotonic()
+
+    def _sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds * self.time_scale)
+
+    def _set_busy(self, key):
+        self._busy_until = self._now() + self.busy_seconds.get(key, 0) * self.time_scale
+
+    def _receive(self, view):
+        # Model the wire time of the transfer at the configured clock
+        self._stats['spi_transfers'] += 1
+        self._sleep(len(view) * 8.0 / self.SPI_SPEED_HZ)
+        if not self._levels.get(self.DC_PIN):
+            for command in view:
+                self._command = command
+                self._stats['commands'] += 1
+                if command == 0x10:     # DATA_START_TRANSMISSION
+                    self._frame = bytearray()
+                elif command == 0x12:   # DISPLAY_REFRESH
+                    self._stats['refreshes'] += 1
+                    self._stats['last_frame'] = bytes(self._frame)
+                if command in self.busy_seconds:
+                    self._set_busy(command)
+        else:
+            self._stats['data_bytes'] += len(view)
+            if self._command == 0x10:
+                self._frame += view
+
+    def digital_write(self, pin, value):
+        value = bool(value)
+        self._stats['gpio_writes'] += 1
+        # The controller resets on the rising edge of RST
+        if pin == self.RST_PIN and value and self._levels.get(pin) is False:
+            self._set_busy('RESET')
+        self._levels[pin] = value
+
+    def digital_read(self, pin):
+        if pin == self.BUSY_PIN:
+            # 0: busy, 1: idle
+            return 0 if self.stuck_busy or self._now() < self._busy_until else 1
+        return int(self._levels.get(pin, False))
+
+    def digital_wait_high(self, pin, timeout=None):
+        if pin != self.BUSY_PIN:
+            return _poll_until_high(lambda: self.digital_read(pin), timeout)
+        remaining = float('inf') if self.stuck_busy else self._busy_until - self._now()
+        if timeout is not None and remaining > timeout:
+            time.sleep(timeout)
+            return False
+        if remaining > 0:
+            time.sleep(remaining)
+        return True
+
+    def delay_ms(self, delaytime):
+        self._sleep(delaytime / 1000.0)
 
-for func in [x for x in dir(implementation) if not x.startswith('_')]:
-    setattr(sys.modules[__name__], func, getattr(implementation, func))
+    def spi_writebyte(self, data):
+        self._receive(_byte_view(data))
+
+    def spi_writebyte2(self, data):
+        view = _byte_view(data)
+        chunk = self.SPI_CHUNK_SIZE
+        for start in range(0, len(view), chunk):
+            self._receive(view[start:start + chunk])
+
+    def spi_configure(self, speed_hz=None, chunk_size=None):
+        if speed_hz:
+            self.SPI_SPEED_HZ = int(speed_hz)
+        if chunk_size:
+            self.SPI_CHUNK_SIZE = max(1, int(chunk_size))
+
+    def sim_configure(self, time_scale=None, stuck_busy=None, busy_seconds=None):
+        """Adjust the timing model; time_scale < 1 runs faster than real time."""
+        if time_scale is not None:
+            self.time_scale = float(time_scale)
+        if stuck_busy is not None:
+            self.stuck_busy = bool(stuck_busy)
+        if busy_seconds:
+            self.busy_seconds.update(busy_seconds)
+
+    def sim_stats(self):
+        """Return counters collected since the last sim_reset_stats()."""
+        return dict(self._stats)
+
+    def sim_reset_stats(self):
+        self._stats = {
+            'module_inits': 0,
+            'gpio_writes': 0,
+            'spi_transfers': 0,
+            'commands': 0,
+            'data_bytes': 0,
+            'refreshes': 0,
+            'last_frame': None,
+        }
+
+    def module_init(self):
+        self._stats['module_inits'] += 1
+        self._levels[self.PWR_PIN] = True
+        return 0
+
+    def module_exit(self):
+        logger.debug("simulated module exit")
+        self._levels.clear()
+
+
+def use_implementation(impl):
+    """Route the module-level functions of this module to impl."""
+    global implementation
+    implementation = impl
+    for func in [x for x in dir(impl) if not x.startswith('_')]:
+        setattr(sys.modules[__name__], func, getattr(impl, func))
+
+
+# EPD_BACKEND=simulated selects the software model instead of probing the board
+if os.environ.get('EPD_BACKEND', '').lower() == 'simulated':
+    use_implementation(Simulated())
+else:
+    if sys.version_info[0] == 2:
+        process = subprocess.Popen("cat /proc/cpuinfo | grep Raspberry", shell=True, stdout=subprocess.PIPE)
+    else:
+        process = subprocess.Popen("cat /proc/cpuinfo | grep Raspberry", shell=True, stdout=subprocess.PIPE, text=True)
+    output, _ = process.communicate()
+    if sys.version_info[0] == 2:
+        output = output.decode(sys.stdout.encoding)
+
+    if "Raspberry" in output:
+        use_implementation(RaspberryPi())
+    elif os.path.exists('/sys/bus/platform/drivers/gpio-x3'):
+        use_implementation(SunriseX3())
+    else:
+        use_implementation(JetsonNano())
 
 ### END OF FILE ###
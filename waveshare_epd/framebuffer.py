@@ -0,0 +1,87 @@
+"""
+Frame buffer formats of the e-paper panels: their colors, how pixels are
+packed into bytes and the constant frames that fill a panel with one color.
+Nothing here touches the hardware, so the render pipeline can use it without
+probing the board the way importing a driver module does.
+"""
+
+from functools import lru_cache
+
+from PIL import Image
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# The 7 colors supported by the epd7in3f panel, in pixel code order
+EPD7IN3F_PALETTE = (
+    (0, 0, 0),        # black
+    (255, 255, 255),  # white
+    (0, 255, 0),      # green
+    (0, 0, 255),      # blue
+    (255, 0, 0),      # red
+    (255, 255, 0),    # yellow
+    (255, 128, 0),    # orange
+)
+
+
+def pack_pixels(indices, bits_per_pixel):
+    """
+    Pack one value per byte into bits_per_pixel bits each, first pixel in the high bits.
+
+    Args:
+        indices (bytes-like): The pixel values; their count must be a multiple of
+            the pixels per byte.
+        bits_per_pixel (int): 1, 2, 4 or 8.
+
+    Returns:
+        bytearray: The packed pixels, ready for the SPI layer.
+    """
+    if bits_per_pixel == 8:
+        return bytearray(indices)
+    per_byte = 8 // bits_per_pixel
+    if np is not None:
+        pixels = np.frombuffer(indices, dtype=np.uint8).reshape(-1, per_byte)
+        packed = pixels[:, 0] << (8 - bits_per_pixel)
+        for i in range(1, per_byte):
+            packed |= pixels[:, i] << (8 - bits_per_pixel * (i + 1))
+        return bytearray(packed.tobytes())
+
+    # Pure-Python fallback: the bit fields never overlap, so OR-ing the
+    # shifted pixel columns as big integers packs every byte in one go
+    indices = bytes(indices)
+    count = len(indices) // per_byte
+    packed = 0
+    for i in range(per_byte):
+        shift = 8 - bits_per_pixel * (i + 1)
+        column = indices[i::per_byte].translate(bytes(((v << shift) & 0xFF) for v in range(256)))
+        packed |= int.from_bytes(column, 'big')
+    return bytearray(packed.to_bytes(count, 'big'))
+
+
+@lru_cache(maxsize=32)
+def clear_frame(code, bits_per_pixel, pixels):
+    """
+    Return the constant frame filling a panel with one color.
+
+    Args:
+        code (int): Pixel code of the color.
+        bits_per_pixel (int): 1, 2, 4 or 8.
+        pixels (int): Number of pixels of the panel.
+
+    Returns:
+        bytes: The packed frame, shared by all calls with the same arguments.
+    """
+    byte = 0
+    for _ in range(8 // bits_per_pixel):
+        byte = (byte << bits_per_pixel) | code
+    return bytes([byte]) * (pixels * bits_per_pixel // 8)
+
+
+@lru_cache(maxsize=8)
+def palette_image(palette):
+    """Return a palette as a "P" image for Image.quantize, shared by all calls."""
+    image = Image.new("P", (1, 1))
+    image.putpalette(sum(palette, ()) + (0, 0, 0) * (256 - len(palette)))
+    return image